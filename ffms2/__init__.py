@@ -16,21 +16,29 @@
 #   You should have received a copy of the GNU Lesser General Public License
 #   along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
 import contextlib
 import functools
+import itertools
+import hashlib
+import importlib
 import math
 import os
+import queue
 import sys
-from collections import namedtuple
+import tempfile
+import threading
+import time
+import warnings
+import weakref
+from collections import OrderedDict, deque, namedtuple
 from ctypes import *
 from fractions import Fraction
 
-# TODO: Use stdlib if numpy is not available.
-import numpy
-
 from .av_log import *
 from .enums import *
 from .libffms2 import *
+from .stats import Stats, format_prometheus
 
 try:
     from collections.abc import Iterable, Sized
@@ -38,6 +46,26 @@ except ImportError:
     from collections import Iterable, Sized
 
 
+class _LazyModule:
+    """Module imported on first attribute access
+    """
+
+    def __init__(self, name):
+        self.__name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name)
+        # Later lookups go straight to the module.
+        globals()[self.__name] = module
+        return getattr(module, attr)
+
+
+# numpy and asyncio are imported on first use, so that importing is fast.
+# TODO: Use stdlib if numpy is not available.
+numpy = _LazyModule("numpy")
+asyncio = _LazyModule("asyncio")
+
+
 __all__ = [
     "get_version",
     "get_pix_fmt",
@@ -47,9 +75,21 @@ __all__ = [
     "set_log_level",
     "Error",
     "Indexer",
+    "ProgressEvent",
     "Index",
     "VideoSource",
+    "VideoSourcePool",
     "AudioSource",
+    "AudioPeaks",
+    "FrameCacheInfo",
+    "IndexCache",
+    "get_index_cache",
+    "set_index_cache",
+    "get_executor",
+    "set_executor",
+    "set_library_path",
+    "get_stats",
+    "format_stats_prometheus",
     "FFINDEX_EXT",
     "DEFAULT_AUDIO_FILENAME_FORMAT",
     "FFMS_CH_BACK_CENTER",
@@ -161,8 +201,13 @@ __all__ = [
 ]
 
 FFINDEX_EXT = ".ffindex"
+# Smaller index data is rejected before FFMS reads it.
+_MIN_INDEX_SIZE = 76
 DEFAULT_AUDIO_FILENAME_FORMAT = "%sourcefile%_track%trackzn%.w64"
-PIX_FMT_NONE = FFMS_GetPixFmt(b"none")
+# AV_PIX_FMT_NONE, without loading the library.
+PIX_FMT_NONE = -1
+
+_clock = time.perf_counter
 
 
 if os.name == "nt":
@@ -205,33 +250,45 @@ if os.name == "nt":
         pythoncom.CoUninitialize()
         pythoncom._initialized = False
 
-    ffms_init()
+
 else:
     FILENAME_ENCODING = sys.getfilesystemencoding()
 
     def get_encoded_path(path):
         return str(path).encode(FILENAME_ENCODING)
 
-    FFMS_Init(0, 0)
+    def ffms_init():
+        FFMS_Init(0, 0)
 
 
-if FFMS_SetOutputFormatV2 is None:
+add_init_hook(ffms_init)
 
-    def FFMS_SetOutputFormatV2(
-        source, target_formats, width, height, resizer, p_err_info
-    ):
-        """Substitute when using FFMS 2.15-
-        """
-        while target_formats and target_formats[-1] < 0:
-            target_formats = target_formats[:-1]
-        return FFMS_SetOutputFormatV(
+
+def _set_output_format(
+    source, target_formats, width, height, resizer, p_err_info
+):
+    if FFMS_SetOutputFormatV2.available:
+        return FFMS_SetOutputFormatV2(
             source,
-            list_to_mask(target_formats),
+            cast(
+                (c_int * len(target_formats))(*target_formats), POINTER(c_int)
+            ),
             width,
             height,
             resizer,
             p_err_info,
         )
+    # Substitute when using FFMS 2.15-
+    while target_formats and target_formats[-1] < 0:
+        target_formats = target_formats[:-1]
+    return FFMS_SetOutputFormatV(
+        source,
+        list_to_mask(target_formats),
+        width,
+        height,
+        resizer,
+        p_err_info,
+    )
 
 
 def get_version_info():
@@ -275,13 +332,29 @@ def set_log_level(level=AV_LOG_QUIET):
     return FFMS_SetLogLevel(level)
 
 
-err_msg = create_string_buffer(1024)
-err_info = FFMS_ErrorInfo(
-    FFMS_ERROR_SUCCESS,
-    FFMS_ERROR_SUCCESS,
-    sizeof(err_msg),
-    cast(err_msg, STRING),
-)
+_thread_local = threading.local()
+
+
+def _get_err_info():
+    """Return the FFMS_ErrorInfo buffer of the calling thread.
+
+    Each thread gets its own buffer so that concurrent failures in
+    different threads can’t overwrite each other’s messages.
+    """
+    try:
+        return _thread_local.err_info
+    except AttributeError:
+        err_msg = create_string_buffer(1024)
+        err_info = FFMS_ErrorInfo(
+            FFMS_ERROR_SUCCESS,
+            FFMS_ERROR_SUCCESS,
+            sizeof(err_msg),
+            cast(err_msg, STRING),
+        )
+        # Keep the message buffer alive as long as the error info.
+        _thread_local.err_msg = err_msg
+        _thread_local.err_info = err_info
+        return err_info
 
 
 class Error(Exception):
@@ -299,33 +372,76 @@ class Error(Exception):
             self.error_type = error_type
             self.sub_type = sub_type
         else:
+            err_info = _get_err_info()
             super().__init__(err_info.Buffer.decode())
             self.error_type = err_info.ErrorType
             self.sub_type = err_info.SubType
 
 
-class Indexer:
+class _Closable:
+    """Owner of a native handle, freed by close() or when collected
+    """
+
+    _closed = False
+    _finalizer = None
+
+    def _own_handle(self, handle, destroy):
+        # finalize() calls destroy at most once, so whichever comes first
+        # of close(), garbage collection or interpreter exit frees it.
+        self._finalizer = weakref.finalize(self, destroy, handle)
+        return handle
+
+    @property
+    def closed(self):
+        """Whether the object was closed
+        """
+        return self._closed
+
+    def close(self):
+        """Free the native resources now, instead of waiting for
+        garbage collection. Using the object afterwards raises ValueError.
+        """
+        self._closed = True
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class Indexer(_Closable):
     """FFMS_Indexer
     """
 
     _AUDIO_DUMP_EXT = ".w64"
-    _FFMS_CancelIndexing = FFMS_CancelIndexing
 
     def __init__(self, source_file):
         """Create an indexer object for the given source file.
         """
         self._indexer = FFMS_CreateIndexer(
-            get_encoded_path(source_file), byref(err_info)
+            get_encoded_path(source_file), byref(_get_err_info())
         )
         if not self._indexer:
             raise Error
+        self._own_handle(self._indexer, FFMS_CancelIndexing)
         self.source_file = source_file
         self._track_info_list = None
         self._ic = None
+        self._ic_private = None
+        self._callback = None
+        self._cancel_event = threading.Event()
+        self._progress_listeners = []
 
-    def __del__(self):
-        if self._indexer:
-            self._FFMS_CancelIndexing(self._indexer)
+    def close(self):
+        """Free the indexer without indexing.
+
+        Use cancel() to stop indexing from another thread.
+        """
+        super().close()
+        self._indexer = None
 
     @property
     def track_info_list(self):
@@ -360,46 +476,277 @@ class Indexer:
         FFMS_TrackIndexSettings(self._indexer, track, int(index), int(dump))
 
     def set_progress_callback(self, ic, ic_private=None):
+        """Set a function called as ic(current, total, ic_private) during
+        indexing, which may return a nonzero value to cancel it.
+        """
         self._check_indexer()
-        self._ic = TIndexCallback(ic) if ic else cast(ic, TIndexCallback)
-        FFMS_SetProgressCallback(
-            self._indexer, self._ic, cast(ic_private, c_void_p)
-        )
+        self._ic = ic
+        self._ic_private = ic_private
+
+    def cancel(self):
+        """Cancel indexing, from any thread.
 
-    def do_indexing2(self, error_handling=FFMS_IEH_STOP_TRACK):
+        do_indexing2() then raises an Error.
+        """
+        self._cancel_event.set()
+
+    def progress_queue(self, maxsize=0):
+        """Return a queue receiving ProgressEvent objects from the next
+        indexing run, then None when it is over.
+
+        Events that don't fit in a full queue are dropped. The final None
+        is always delivered, replacing the oldest event if needed.
+        """
+        self._check_indexer()
+        progress_queue = queue.Queue(maxsize)
+
+        def put(event):
+            if event is not None:
+                with contextlib.suppress(queue.Full):
+                    progress_queue.put_nowait(event)
+                return
+            # The end of the run must get through, even if the consumer
+            # is behind: make room by dropping the oldest events.
+            while True:
+                try:
+                    progress_queue.put_nowait(None)
+                    return
+                except queue.Full:
+                    with contextlib.suppress(queue.Empty):
+                        progress_queue.get_nowait()
+
+        self._progress_listeners.append(put)
+        return progress_queue
+
+    def iter_progress(self):
+        """Return an iterator of ProgressEvent objects from the next
+        indexing run, which may run in another thread.
+        """
+        return iter(self.progress_queue().get, None)
+
+    def progress_async(self):
+        """Return an asynchronous iterator of ProgressEvent objects from
+        the next indexing run.
+        """
+        self._check_indexer()
+        stream = _ProgressStream()
+        self._progress_listeners.append(stream._put)
+        return stream
+
+    def do_indexing2(self, error_handling=FFMS_IEH_STOP_TRACK, timeout=None):
         """Index the file.
+
+        If indexing takes more than timeout seconds, it is cancelled
+        and an Error is raised.
         """
         self._check_indexer()
-        index = FFMS_DoIndexing2(
-            self._indexer, error_handling, byref(err_info)
+        progress = _IndexingProgress(
+            self._ic, self._cancel_event, self._progress_listeners, timeout
         )
-        self._indexer = None
+        # Keep the callback alive for as long as FFMS may call it.
+        self._callback = TIndexCallback(progress)
+        FFMS_SetProgressCallback(
+            self._indexer, self._callback, cast(self._ic_private, c_void_p)
+        )
+        # FFMS_DoIndexing2() frees the indexer.
+        self._finalizer.detach()
+        try:
+            index = FFMS_DoIndexing2(
+                self._indexer, error_handling, byref(_get_err_info())
+            )
+        finally:
+            self._indexer = None
+            progress.close()
         if not index:
+            if progress.timed_out:
+                raise Error(
+                    "indexing timed out after {} seconds".format(timeout),
+                    FFMS_ERROR_CANCELLED,
+                    FFMS_ERROR_USER,
+                )
             raise Error
         return Index(index, source_file=self.source_file)
 
+    async def do_indexing2_async(
+        self, error_handling=FFMS_IEH_STOP_TRACK, timeout=None
+    ):
+        """Index the file without blocking the event loop.
+
+        Cancelling the awaiting task cancels indexing.
+        """
+        self._check_indexer()
+        try:
+            return await _run_async(self.do_indexing2, error_handling, timeout)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
     def _check_indexer(self):
+        if self._closed:
+            raise ValueError("indexer is closed")
         if not self._indexer:
             raise ValueError("indexing already done")
 
 
-class Index:
+ProgressEvent = namedtuple(
+    "ProgressEvent", ("current", "total", "percent", "rate", "eta")
+)
+ProgressEvent.__doc__ = """Indexing progress
+
+current and total are byte positions in the source file, rate is
+in bytes per second and eta in seconds (None until known).
+"""
+
+
+class _IndexingProgress:
+    # Progress callback of an indexing run.
+
+    def __init__(self, ic, cancel_event, listeners, timeout=None):
+        self.ic = ic
+        self.cancel_event = cancel_event
+        self.listeners = listeners
+        self.start = time.monotonic()
+        self.deadline = None if timeout is None else self.start + timeout
+        self.timed_out = False
+        self.last_step = -1
+
+    def __call__(self, current, total, private):
+        now = time.monotonic()
+        if self.listeners:
+            # Report at most a thousand steps.
+            step = current * 1000 // total if total > 0 else 0
+            if step != self.last_step:
+                self.last_step = step
+                self.notify(current, total, now)
+        if self.cancel_event.is_set():
+            return 1
+        if self.deadline is not None and now > self.deadline:
+            self.timed_out = True
+            return 1
+        if self.ic:
+            return self.ic(current, total, private) or 0
+        return 0
+
+    def notify(self, current, total, now):
+        elapsed = now - self.start
+        rate = current / elapsed if elapsed > 0 else 0.0
+        eta = (total - current) / rate if rate > 0 else None
+        percent = 100 * current / total if total > 0 else 0.0
+        event = ProgressEvent(current, total, percent, rate, eta)
+        for listener in self.listeners:
+            listener(event)
+
+    def close(self):
+        for listener in self.listeners:
+            listener(None)
+        del self.listeners[:]
+
+
+class _ProgressStream:
+    # Events are buffered from any thread, and the event loop is only
+    # known once the stream is iterated.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = deque()
+        self._waiter = None
+
+    def _put(self, item):
+        with self._lock:
+            self._items.append(item)
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.get_loop().call_soon_threadsafe(_wake_up, waiter)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            with self._lock:
+                if self._items:
+                    item = self._items[0]
+                    # The end of the stream stays for later calls.
+                    if item is not None:
+                        self._items.popleft()
+                    break
+                waiter = (
+                    self._waiter
+                ) = asyncio.get_running_loop().create_future()
+            await waiter
+        if item is None:
+            raise StopAsyncIteration
+        return item
+
+
+def _wake_up(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Index(_Closable):
     """FFMS_Index
     """
 
-    _FFMS_DestroyIndex = FFMS_DestroyIndex
-
     def __init__(self, index, index_file=None, source_file=None):
-        self._index = index
+        self._handle = self._own_handle(index, FFMS_DestroyIndex)
+        self._data = None
         self.index_file = index_file
         self.source_file = source_file
         self._tracks = None
 
+    def __getstate__(self):
+        # The index is pickled serialized, and read again on first use.
+        if self._data is None:
+            self._data = self.to_bytes()
+        return {
+            "data": self._data,
+            "index_file": self.index_file,
+            "source_file": self.source_file,
+        }
+
+    def __setstate__(self, state):
+        self._handle = None
+        self._data = state["data"]
+        self.index_file = state["index_file"]
+        self.source_file = state["source_file"]
+        self._tracks = None
+
+    @property
+    def _index(self):
+        if self._closed:
+            raise ValueError("index is closed")
+        if self._handle is None:
+            self._handle = self._own_handle(
+                self._read_buffer(self._data), FFMS_DestroyIndex
+            )
+        return self._handle
+
+    def close(self):
+        """Free the index.
+
+        Sources already created from it remain usable, but can't be
+        pickled anymore, unless the index was serialized before.
+        """
+        super().close()
+        self._tracks = None
+
     @classmethod
-    def make(cls, source_file, error_handling=FFMS_IEH_STOP_TRACK):
+    def make(
+        cls, source_file, error_handling=FFMS_IEH_STOP_TRACK, timeout=None
+    ):
         """Index a given source file.
         """
-        return Indexer(source_file).do_indexing2(error_handling)
+        return Indexer(source_file).do_indexing2(error_handling, timeout)
+
+    @classmethod
+    async def make_async(
+        cls, source_file, error_handling=FFMS_IEH_STOP_TRACK, timeout=None
+    ):
+        """Index a given source file without blocking the event loop.
+        """
+        indexer = await _run_async(Indexer, source_file)
+        return await indexer.do_indexing2_async(error_handling, timeout)
 
     @classmethod
     def read(cls, index_file=None, source_file=None):
@@ -419,23 +766,23 @@ class Index:
                 FFMS_ERROR_PARSER,
                 FFMS_ERROR_FILE_READ,
             )
-        elif os.path.getsize(index_file) < 76:
+        elif os.path.getsize(index_file) < _MIN_INDEX_SIZE:
             raise Error(
                 "bad index file {!r}".format(index_file),
                 FFMS_ERROR_PARSER,
                 FFMS_ERROR_FILE_READ,
             )
-        index = FFMS_ReadIndex(get_encoded_path(index_file), byref(err_info))
+        index = FFMS_ReadIndex(
+            get_encoded_path(index_file), byref(_get_err_info())
+        )
         if not index:
             raise Error
         self = cls(index, index_file, source_file)
         if source_file and not self.belongs_to_file(source_file):
+            self.close()
             raise Error
         return self
 
-    def __del__(self):
-        self._FFMS_DestroyIndex(self._index)
-
     def write(self, index_file=None):
         """Write an index object to disk.
         """
@@ -443,10 +790,76 @@ class Index:
             self.index_file = index_file
         elif not self.index_file:
             self.index_file = self.source_file + FFINDEX_EXT
+        self._write(self.index_file)
+
+    def _write(self, index_file):
         if FFMS_WriteIndex(
-            get_encoded_path(self.index_file), self._index, byref(err_info)
+            get_encoded_path(index_file), self._index, byref(_get_err_info())
+        ):
+            raise Error
+
+    def to_bytes(self):
+        """Serialize the index to bytes.
+        """
+        if not FFMS_WriteIndexToBuffer.available:
+            # Substitute when FFMS lacks index buffer functions
+            fd, tmp_index_file = tempfile.mkstemp(FFINDEX_EXT)
+            os.close(fd)
+            try:
+                self._write(tmp_index_file)
+                with open(tmp_index_file, "rb") as f:
+                    return f.read()
+            finally:
+                os.remove(tmp_index_file)
+        buf = POINTER(c_uint8)()
+        size = c_size_t()
+        if FFMS_WriteIndexToBuffer(
+            byref(buf), byref(size), self._index, byref(_get_err_info())
         ):
             raise Error
+        try:
+            return string_at(buf, size.value)
+        finally:
+            FFMS_FreeIndexBuffer(byref(buf))
+
+    @classmethod
+    def from_bytes(cls, data, source_file=None):
+        """Load an index serialized with to_bytes().
+
+        If source_file is given, the index must belong to it.
+        """
+        data = bytes(data)
+        self = cls(cls._read_buffer(data), source_file=source_file)
+        if source_file and not self.belongs_to_file(source_file):
+            self.close()
+            raise Error
+        self._data = data
+        return self
+
+    @staticmethod
+    def _read_buffer(data):
+        if len(data) < _MIN_INDEX_SIZE:
+            raise Error(
+                "bad index data", FFMS_ERROR_PARSER, FFMS_ERROR_FILE_READ
+            )
+        if not FFMS_ReadIndexFromBuffer.available:
+            # Substitute when FFMS lacks index buffer functions
+            fd, tmp_index_file = tempfile.mkstemp(FFINDEX_EXT)
+            try:
+                with open(fd, "wb") as f:
+                    f.write(data)
+                index = FFMS_ReadIndex(
+                    get_encoded_path(tmp_index_file), byref(_get_err_info())
+                )
+            finally:
+                os.remove(tmp_index_file)
+        else:
+            index = FFMS_ReadIndexFromBuffer(
+                data, len(data), byref(_get_err_info())
+            )
+        if not index:
+            raise Error
+        return index
 
     @property
     def error_handling(self):
@@ -458,7 +871,7 @@ class Index:
         """Get the track number of the first track of a given type.
         """
         track_number = FFMS_GetFirstTrackOfType(
-            self._index, track_type, byref(err_info)
+            self._index, track_type, byref(_get_err_info())
         )
         if track_number < 0:
             raise Error
@@ -468,7 +881,7 @@ class Index:
         """Get the track number of the first indexed track of a given type.
         """
         track_number = FFMS_GetFirstIndexedTrackOfType(
-            self._index, track_type, byref(err_info)
+            self._index, track_type, byref(_get_err_info())
         )
         if track_number < 0:
             raise Error
@@ -492,7 +905,9 @@ class Index:
         """
         return (
             FFMS_IndexBelongsToFile(
-                self._index, get_encoded_path(source_file), byref(err_info)
+                self._index,
+                get_encoded_path(source_file),
+                byref(_get_err_info()),
             )
             == 0
         )
@@ -506,19 +921,300 @@ class AudioType:
     type = FFMS_TYPE_AUDIO  # @ReservedAssignment
 
 
-class Source:
+class IndexCache:
+    """Persistent cache of indexes, keyed by source file identity
+    """
+
+    _HASH_SIZE = 1 << 16
+
+    def __init__(self, cache_dir, max_size=None, max_age=None):
+        """Create an index cache in a given directory.
+
+        max_size (in bytes) and max_age (in seconds) limit the cache
+        size; least recently used indexes are evicted first.
+        """
+        self.cache_dir = str(cache_dir)
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def get_key(self, source_file):
+        """Get the cache key of a source file.
+
+        The key is derived from the file size, modification time,
+        a hash of its first and last bytes and the FFMS version.
+        """
+        st = os.stat(str(source_file))
+        h = hashlib.sha1(
+            "{}:{}:{}:".format(
+                st.st_size, st.st_mtime_ns, FFMS_GetVersion()
+            ).encode()
+        )
+        with open(str(source_file), "rb") as f:
+            h.update(f.read(self._HASH_SIZE))
+            if st.st_size > 2 * self._HASH_SIZE:
+                f.seek(-self._HASH_SIZE, os.SEEK_END)
+                h.update(f.read())
+        return h.hexdigest()
+
+    def get_index_file(self, source_file):
+        """Get the path of the cached index file for a source file.
+        """
+        return os.path.join(
+            self.cache_dir, self.get_key(source_file) + FFINDEX_EXT
+        )
+
+    def get(self, source_file):
+        """Get the cached index of a source file, or None.
+        """
+        try:
+            index_file = self.get_index_file(source_file)
+            index = Index.read(index_file, source_file)
+            # Mark as recently used.
+            os.utime(index_file)
+        except (Error, OSError):
+            return None
+        # Track output files shouldn’t be written to the cache directory.
+        index.index_file = None
+        return index
+
+    def put(self, index):
+        """Store the index of a source file.
+        """
+        index_file = self.get_index_file(index.source_file)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_file = "{}.{}.tmp".format(index_file, os.getpid())
+        try:
+            index._write(tmp_file)
+            os.replace(tmp_file, index_file)
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_file)
+        self.prune()
+
+    def prune(self):
+        """Evict expired indexes, then least recently used indexes
+        until the cache fits in max_size. Track files stored with an
+        index count toward its size and are evicted with it.
+        """
+        if self.max_size is None and self.max_age is None:
+            return
+        now = time.time()
+        # Track files, such as audio peaks, are grouped with their index:
+        # base name -> [index mtime, total size, paths]
+        groups = {}
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                i = entry.name.find(FFINDEX_EXT)
+                if i < 0:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                base = entry.name[: i + len(FFINDEX_EXT)]
+                group = groups.setdefault(base, [None, 0, []])
+                if entry.name == base:
+                    group[0] = st.st_mtime
+                group[1] += st.st_size
+                group[2].append((st.st_mtime, entry.path))
+        entries = []
+        total_size = 0
+        for mtime, size, files in groups.values():
+            if mtime is None:
+                # Track files without a cached index
+                mtime = max(file_mtime for file_mtime, _ in files)
+            paths = [path for _, path in files]
+            if self.max_age is not None and now - mtime > self.max_age:
+                self._remove_all(paths)
+                continue
+            entries.append((mtime, size, paths))
+            total_size += size
+        if self.max_size is not None:
+            for _, size, paths in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                self._remove_all(paths)
+                total_size -= size
+
+    def clear(self):
+        """Remove all cached indexes and their track files.
+        """
+        with contextlib.suppress(FileNotFoundError):
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if FFINDEX_EXT in entry.name:
+                        self._remove(entry.path)
+
+    def _remove_all(self, paths):
+        for path in paths:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        # Another process may have removed it already.
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+
+INDEX_CACHE_ENV = "FFMS2_INDEX_CACHE"
+INDEX_CACHE_MAX_SIZE_ENV = "FFMS2_INDEX_CACHE_MAX_SIZE"
+INDEX_CACHE_MAX_AGE_ENV = "FFMS2_INDEX_CACHE_MAX_AGE"
+DEFAULT_INDEX_CACHE_MAX_SIZE = 1 << 30
+_index_cache = False
+
+
+def get_index_cache():
+    """Get the index cache used by sources created without an index.
+
+    Defaults to the directory given by the FFMS2_INDEX_CACHE
+    environment variable, if any. Its size in bytes is limited by
+    FFMS2_INDEX_CACHE_MAX_SIZE (1 GiB by default, 0 for no limit), and
+    the age of its indexes in seconds by FFMS2_INDEX_CACHE_MAX_AGE.
+    """
+    global _index_cache
+    if _index_cache is False:
+        cache_dir = os.environ.get(INDEX_CACHE_ENV)
+        if cache_dir:
+            max_size = _get_env_limit(
+                INDEX_CACHE_MAX_SIZE_ENV, DEFAULT_INDEX_CACHE_MAX_SIZE
+            )
+            max_age = _get_env_limit(INDEX_CACHE_MAX_AGE_ENV)
+            _index_cache = IndexCache(cache_dir, max_size, max_age)
+        else:
+            _index_cache = None
+    return _index_cache
+
+
+def _get_env_limit(name, default=None):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        limit = float(value)
+    except ValueError:
+        warnings.warn(
+            "invalid {} value: {!r}".format(name, value), RuntimeWarning
+        )
+        return default
+    return limit or None
+
+
+def set_index_cache(cache, max_size=None, max_age=None):
+    """Set the index cache used by sources created without an index.
+
+    cache is an IndexCache, a directory, or None to disable caching.
+    """
+    global _index_cache
+    if cache is not None and not isinstance(cache, IndexCache):
+        cache = IndexCache(cache, max_size, max_age)
+    _index_cache = cache
+
+
+_executor = None
+
+
+def get_executor():
+    """Get the executor running the asynchronous API.
+
+    Defaults to a thread pool created on first use.
+    """
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        _executor = ThreadPoolExecutor()
+    return _executor
+
+
+def set_executor(executor):
+    """Set the executor running the asynchronous API.
+
+    executor is a concurrent.futures thread pool, or None to use
+    the default one.
+    """
+    global _executor
+    _executor = executor
+
+
+async def _run_async(func, *args, lock=None):
+    # lock is an asyncio lock or semaphore, acquired on the event loop so
+    # that waiting calls don't hold executor threads.
+    loop = asyncio.get_running_loop()
+    if lock is None:
+        return await loop.run_in_executor(get_executor(), func, *args)
+    await lock.acquire()
+    try:
+        future = get_executor().submit(func, *args)
+    except BaseException:
+        lock.release()
+        raise
+    # Release the lock when the call returns, even if the awaiting task
+    # is cancelled first.
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(lock.release))
+    return await asyncio.wrap_future(future, loop=loop)
+
+
+_STATS_CALLS = ("get_frame", "get_frame_by_time", "get_audio")
+_STATS_COUNTERS = ("retries", "errors", "seeks", "format_switches")
+_stats = Stats(_STATS_CALLS, _STATS_COUNTERS)
+
+
+def get_stats():
+    """Get the performance counters aggregated over all sources.
+
+    See Source.stats().
+    """
+    return _stats.snapshot()
+
+
+def format_stats_prometheus(stats=None):
+    """Format performance counters in the Prometheus text format.
+
+    Defaults to the counters aggregated over all sources.
+    """
+    return format_prometheus(get_stats() if stats is None else stats)
+
+
+class Source(_Closable):
+    _STATS_CALLS = ()
+
     def __init__(self, source_file, track_number=None, index=None):
+        # Serializes the asynchronous API calls on this source,
+        # and close() with them.
+        self._async_lock = None
+        self._lock = threading.Lock()
+        self._stats = Stats(self._STATS_CALLS, _STATS_COUNTERS, _stats)
+        # An index created here is closed with the source.
+        self._owns_index = not index
         if not index:
+            indexed_tracks = ()
             try:
                 index = Index.read(source_file=source_file)
-                if track_number is None:
-                    track_number = index.get_first_indexed_track_of_type(
-                        self.type
-                    )
-                elif not index.tracks[track_number].frame_info_list:
-                    index = None
             except Error:
                 index = None
+            else:
+                try:
+                    track_number = self._get_indexed_track(index, track_number)
+                except Error:
+                    index.close()
+                    index = None
+            cache = get_index_cache()
+            if not index and cache:
+                index = cache.get(source_file)
+                if index:
+                    try:
+                        track_number = self._get_indexed_track(
+                            index, track_number
+                        )
+                    except Error:
+                        # Reindex, keeping the tracks that were indexed.
+                        indexed_tracks = [
+                            track.number
+                            for track in index.tracks
+                            if len(track.frame_info_array)
+                        ]
+                        index.close()
+                        index = None
             if not index:
                 indexer = Indexer(source_file)
 
@@ -536,22 +1232,121 @@ class Source:
 
                 for track in indexer.track_info_list:
                     indexer.track_index_settings(
-                        track.num, track_number == track.num, 0
+                        track.num,
+                        track_number == track.num
+                        or track.num in indexed_tracks,
+                        0,
                     )
 
                 index = indexer.do_indexing2()
+                if cache:
+                    try:
+                        cache.put(index)
+                    except (Error, OSError) as e:
+                        warnings.warn(
+                            "can’t cache index: {}".format(e), RuntimeWarning
+                        )
         elif track_number is None:
             track_number = index.get_first_indexed_track_of_type(self.type)
         self.track_number = track_number
         self.index = index
         self._track = None
+        self._handle = None
+
+    def __getstate__(self):
+        # Native handles, locks and statistics aren't pickled:
+        # the source is opened again on first use.
+        return {
+            "track_number": self.track_number,
+            "index": self.index,
+            "owns_index": self._owns_index,
+        }
+
+    def __setstate__(self, state):
+        self._async_lock = None
+        self._lock = threading.Lock()
+        self._stats = Stats(self._STATS_CALLS, _STATS_COUNTERS, _stats)
+        self.track_number = state["track_number"]
+        self.index = state["index"]
+        self._owns_index = state["owns_index"]
+        self._track = None
+        self._handle = None
+
+    def _get_source(self):
+        if self._closed:
+            raise ValueError("source is closed")
+        if self._handle is None:
+            self._open()
+        return self._handle
+
+    _source = property(_get_source)
+
+    @property
+    def properties(self):
+        """Properties of the track
+        """
+        self._get_source()
+        return self._properties
+
+    def close(self):
+        """Free the decoder and close the source file.
+
+        The index is closed too if the source created it, and is left
+        open if it was given.
+        """
+        # Wait for running asynchronous calls.
+        with self._lock:
+            super().close()
+        self._track = None
+        if self._owns_index:
+            self.index.close()
+
+    async def close_async(self):
+        """Close the source after the pending asynchronous calls,
+        without blocking the event loop.
+        """
+        await _run_async(self.close, lock=self._get_async_lock())
+
+    def _get_async_lock(self):
+        loop = asyncio.get_running_loop()
+        if self._async_lock is None or self._async_lock[0] is not loop:
+            self._async_lock = (loop, asyncio.Lock())
+        return self._async_lock[1]
+
+    async def _run_locked_async(self, func, *args):
+        # Only one call runs at a time, the others wait on the event loop.
+        def run():
+            with self._lock:
+                return func(*args)
+
+        return await _run_async(run, lock=self._get_async_lock())
+
+    def stats(self):
+        """Get the performance counters of this source.
+
+        Return the count, total time and cumulative latency histogram of
+        each decoding call, and the number of retries, errors, estimated
+        seeks (non-consecutive requests) and format switches.
+        """
+        return self._stats.snapshot()
+
+    def _get_indexed_track(self, index, track_number):
+        if track_number is None:
+            return index.get_first_indexed_track_of_type(self.type)
+        if not len(index.tracks[track_number].frame_info_array):
+            raise Error(
+                "track {} is not indexed".format(track_number),
+                FFMS_ERROR_INDEX,
+                FFMS_ERROR_NOT_AVAILABLE,
+            )
+        return track_number
 
 
 class VideoSource(VideoType, Source):
     """FFMS_VideoSource
     """
 
-    _FFMS_DestroyVideoSource = FFMS_DestroyVideoSource
+    _STATS_CALLS = ("get_frame", "get_frame_by_time")
 
     def __init__(
         self,
@@ -566,28 +1361,98 @@ class VideoSource(VideoType, Source):
         super().__init__(source_file, track_number, index)
         # GetNumberOfLogicalCPUs() if Threads < 1
         self.num_threads = num_threads
-        self._source = FFMS_CreateVideoSource(
+        self.seek_mode = seek_mode
+        self._output_format = None
+        self._input_format = None
+        self._frame_layouts = {}
+        self._frame_cache = None
+        self._last_frame = None
+        self._open()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.update(
+            num_threads=self.num_threads,
+            seek_mode=self.seek_mode,
+            input_format=self._input_format,
+            output_format=self._output_format,
+            frame_cache_size=None,
+        )
+        # Cached frames are dropped, the cache size is kept.
+        if self._frame_cache is not None:
+            state["frame_cache_size"] = self._frame_cache.max_size
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.num_threads = state["num_threads"]
+        self.seek_mode = state["seek_mode"]
+        self._input_format = state["input_format"]
+        self._output_format = state["output_format"]
+        self._frame_layouts = {}
+        self._frame_cache = None
+        self._last_frame = None
+        if state["frame_cache_size"]:
+            self.enable_frame_cache(state["frame_cache_size"])
+
+    def _open(self):
+        source = FFMS_CreateVideoSource(
             get_encoded_path(self.index.source_file),
             self.track_number,
             self.index._index,
             self.num_threads,
-            seek_mode,
-            byref(err_info),
+            self.seek_mode,
+            byref(_get_err_info()),
         )
-        if not self._source:
+        if not source:
             raise Error
-        self.properties = FFMS_GetVideoProperties(self._source)[0]
-
-    def __del__(self):
-        self._FFMS_DestroyVideoSource(self._source)
+        self._handle = self._own_handle(source, FFMS_DestroyVideoSource)
+        self._properties = FFMS_GetVideoProperties(source)[0]
+        # Restore the formats of an unpickled source.
+        if self._input_format and FFMS_SetInputFormatV(
+            source, *self._input_format, byref(_get_err_info())
+        ):
+            raise Error
+        if self._output_format:
+            target_formats, width, height, resizer = self._output_format
+            if _set_output_format(
+                source,
+                list(target_formats),
+                width,
+                height,
+                resizer,
+                byref(_get_err_info()),
+            ):
+                raise Error
 
     def get_frame(self, n):
         """Retrieve a given video frame.
         """
-        frame = FFMS_GetFrame(self._source, n, byref(err_info))
+        stats = self._stats
+        if self._last_frame is not None and not (
+            self._last_frame <= n <= self._last_frame + 1
+        ):
+            stats.count("seeks")
+        self._last_frame = n
+        start_time = _clock()
+        frame = FFMS_GetFrame(self._source, n, byref(_get_err_info()))
         if not frame:
             # HACK: Seems to fail sometimes. Fixed by retrying…
-            frame = FFMS_GetFrame(self._source, n, byref(err_info))
+            stats.count("retries")
+            frame = FFMS_GetFrame(self._source, n, byref(_get_err_info()))
+            if not frame:
+                stats.count("errors")
+                self._last_frame = None
+                raise Error
+        stats.observe("get_frame", _clock() - start_time)
+        return frame[0]
+
+    def _probe_frame(self):
+        # Decode the first frame to get the frame format, without
+        # counting it as a request.
+        frame = FFMS_GetFrame(self._source, 0, byref(_get_err_info()))
+        if not frame:
+            frame = FFMS_GetFrame(self._source, 0, byref(_get_err_info()))
             if not frame:
                 raise Error
         return frame[0]
@@ -596,13 +1461,460 @@ class VideoSource(VideoType, Source):
         """Retrieve a video frame at a given timestamp.
         (Closest frame from PTS)
         """
-        frame = FFMS_GetFrameByTime(self._source, time, byref(err_info))
+        stats = self._stats
+        # The frame number isn't known, so seeks can't be estimated.
+        self._last_frame = None
+        start_time = _clock()
+        frame = FFMS_GetFrameByTime(self._source, time, byref(_get_err_info()))
         if not frame:
-            frame = FFMS_GetFrameByTime(self._source, time, byref(err_info))
+            stats.count("retries")
+            frame = FFMS_GetFrameByTime(
+                self._source, time, byref(_get_err_info())
+            )
             if not frame:
+                stats.count("errors")
                 raise Error
+        stats.observe("get_frame_by_time", _clock() - start_time)
         return frame[0]
 
+    def get_frame_into(self, n, out, index=None, crop=False):
+        """Decode a given video frame into caller-owned arrays.
+
+        out is an array for single-plane formats, or a sequence of arrays
+        (one per plane) otherwise, as returned by new_frame_buffer().
+        If index is given, the frame is written to out[index] instead,
+        so that a buffer with a leading frame axis can be used as a ring.
+        Return the arrays that were written to.
+        """
+        if index is not None:
+            out = _get_frame_buffer_item(out, index)
+        cache = self._frame_cache
+        if cache is None:
+            arrays = self.get_frame(n).arrays(
+                self.properties if crop else None
+            )
+        else:
+            key = (n, crop, self._input_format, self._output_format)
+            arrays = cache.get(key)
+            if arrays is None:
+                arrays = [
+                    array.copy()
+                    for array in self.get_frame(n).arrays(
+                        self.properties if crop else None
+                    )
+                ]
+                cache.put(key, arrays)
+        if isinstance(out, numpy.ndarray):
+            if len(arrays) != 1:
+                raise ValueError(
+                    "frame has {} planes, got a single array".format(
+                        len(arrays)
+                    )
+                )
+            numpy.copyto(out, arrays[0])
+        else:
+            if len(out) != len(arrays):
+                raise ValueError(
+                    "frame has {} planes, got {} arrays".format(
+                        len(arrays), len(out)
+                    )
+                )
+            for dst, src in zip(out, arrays):
+                numpy.copyto(dst, src)
+        return out
+
+    def enable_frame_cache(self, max_size=256 << 20):
+        """Cache copies of decoded frames, up to max_size bytes.
+
+        The cache is used by get_frame_into() and the methods built on it
+        (get_frames(), iter_frames()...), keyed by frame number and
+        format. Least recently used frames are evicted first.
+        """
+        if self._frame_cache is None:
+            self._frame_cache = _FrameCache(max_size)
+        else:
+            self._frame_cache.resize(max_size)
+
+    def close(self):
+        """Free the decoder, the source file and cached frames.
+
+        The index is closed too if the source created it.
+        """
+        super().close()
+        self._frame_cache = None
+        self._frame_layouts.clear()
+
+    def disable_frame_cache(self):
+        """Disable the frame cache and free its memory.
+        """
+        self._frame_cache = None
+
+    def frame_cache_info(self):
+        """Get frame cache statistics, or None if the cache is disabled.
+        """
+        if self._frame_cache is None:
+            return None
+        return self._frame_cache.info()
+
+    def get_frames(self, indices, crop=False):
+        """Retrieve a batch of video frames.
+
+        Return the frames stacked along a leading axis, in the requested
+        order, as allocated by new_frame_buffer(). Frames are decoded in
+        ascending order, so that each GOP is decoded at most once.
+        """
+        indices = numpy.asarray(indices, numpy.int64).ravel()
+        out = self.new_frame_buffer(len(indices), crop)
+        self._get_frames_into(
+            indices, functools.partial(_get_frame_buffer_item, out), crop
+        )
+        return out
+
+    async def get_frame_async(self, n, crop=False):
+        """Decode a given video frame without blocking the event loop.
+
+        Return a copy of the frame, as allocated by new_frame_buffer().
+        Calls on the same source run one at a time.
+        """
+        return await self._run_locked_async(self._get_frame_copy, n, crop)
+
+    def _get_frame_copy(self, n, crop):
+        return self.get_frame_into(
+            n, self.new_frame_buffer(crop=crop), crop=crop
+        )
+
+    async def get_frames_async(self, indices, crop=False):
+        """Retrieve a batch of video frames without blocking the event
+        loop, as get_frames() does.
+        """
+        return await self._run_locked_async(self.get_frames, indices, crop)
+
+    def _get_frames_into(self, indices, get_item, crop=False):
+        # Sorting by frame number also groups frames by keyframe interval:
+        # FFMS decodes forward within a GOP and only seeks to reach
+        # a later keyframe. Duplicates are decoded once.
+        prev_n = prev_item = None
+        for i in numpy.argsort(indices, kind="stable").tolist():
+            n = int(indices[i])
+            item = get_item(i)
+            if n == prev_n:
+                _copy_frame_buffer(item, prev_item)
+            else:
+                self.get_frame_into(n, item, crop=crop)
+            prev_n, prev_item = n, item
+
+    def iter_frames(
+        self,
+        start=0,
+        end=None,
+        step=1,
+        depth=8,
+        crop=False,
+        target_formats=None,
+        width=None,
+        height=None,
+        resizer=FFMS_RESIZER_BICUBIC,
+    ):
+        """Iterate over video frames, decoding ahead on a background thread.
+
+        Frames are yielded as arrays owned by the caller, with at most
+        depth frames decoded ahead. If target_formats, width or height
+        is given, that output format is used during the iteration.
+        The source must not be used otherwise while iterating.
+        """
+        num_frames = self.properties.NumFrames
+        end = num_frames if end is None else min(end, num_frames)
+        frames = queue.Queue(depth)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def decode():
+            try:
+                for n in range(start, end, step):
+                    out = self.new_frame_buffer(crop=crop)
+                    self.get_frame_into(n, out, crop=crop)
+                    if not put((out, None)):
+                        return
+            except BaseException as e:
+                put((None, e))
+            else:
+                put((None, None))
+
+        with self._temporary_output_format(
+            target_formats, width, height, resizer
+        ):
+            thread = threading.Thread(target=decode, daemon=True)
+            thread.start()
+            try:
+                while True:
+                    out, error = frames.get()
+                    if error is not None:
+                        raise error
+                    if out is None:
+                        break
+                    yield out
+            finally:
+                stop.set()
+                thread.join()
+
+    def sample_frames(
+        self,
+        k,
+        tolerance=None,
+        crop=False,
+        target_formats=None,
+        width=None,
+        height=None,
+        resizer=FFMS_RESIZER_BICUBIC,
+    ):
+        """Decode k frames spread evenly across the video.
+
+        Each of the k evenly spaced positions is moved to the nearest
+        keyframe if it is at most tolerance frames away (half the spacing
+        by default), since keyframes decode without going through a GOP.
+        If target_formats, width or height is given, that output format
+        is used, so that the decoder can downscale frames.
+        Return the frame numbers and the frames, as get_frames() does.
+        """
+        frames = self._get_sample_positions(k, tolerance)
+        with self._temporary_output_format(
+            target_formats, width, height, resizer
+        ):
+            return frames, self.get_frames(frames, crop)
+
+    def _get_sample_positions(self, k, tolerance=None):
+        if k < 1:
+            raise ValueError("k must be positive")
+        num_frames = self.properties.NumFrames
+        k = min(k, num_frames)
+        spacing = num_frames / k
+        targets = ((numpy.arange(k) + 0.5) * spacing).astype(numpy.int64)
+        if tolerance is None:
+            tolerance = spacing / 2
+        keyframes = self.track.keyframes
+        if not len(keyframes):
+            return targets
+        nearest = keyframes[_snap(keyframes, targets, "nearest")]
+        distances = numpy.abs(nearest - targets)
+        # A keyframe is only used for the closest of its targets.
+        order = numpy.lexsort((distances, nearest))
+        first = numpy.ones(k, bool)
+        first[1:] = nearest[order][1:] != nearest[order][:-1]
+        use_keyframe = numpy.empty(k, bool)
+        use_keyframe[order] = first
+        use_keyframe &= distances <= tolerance
+        frames = numpy.where(use_keyframe, nearest, targets)
+        frames.sort()
+        return frames
+
+    def export(
+        self,
+        path,
+        frames=None,
+        format="npy",  # @ReservedAssignment
+        crop=False,
+        target_formats=None,
+        width=None,
+        height=None,
+        resizer=FFMS_RESIZER_BICUBIC,
+        flush_size=64 << 20,
+    ):
+        """Decode frames into a .npy file (format="npy") or a raw file
+        (format="raw"), all frames by default.
+
+        Frames are written through a memory map that is flushed every
+        flush_size bytes, so that memory use stays bounded.
+        Single-plane frames are stored as an array of shape
+        (frames, height, width...), and others as a structured array with
+        one field per plane ("plane0", "plane1"...), which is laid out
+        as raw planar frames. Return the file memory-mapped read-only.
+        """
+        if format not in ("npy", "raw"):
+            raise ValueError(
+                "format must be 'npy' or 'raw', not {!r}".format(format)
+            )
+        if frames is None:
+            frames = range(self.properties.NumFrames)
+        indices = numpy.asarray(frames, numpy.int64).ravel()
+        if not len(indices):
+            raise ValueError("no frames to export")
+        with self._temporary_output_format(
+            target_formats, width, height, resizer
+        ):
+            layout = self._get_frame_layout(crop)
+            if len(layout) == 1:
+                frame_shape, dtype = layout[0]
+                shape = (len(indices),) + frame_shape
+            else:
+                dtype = numpy.dtype(
+                    [
+                        ("plane{}".format(p), plane_dtype, plane_shape)
+                        for p, (plane_shape, plane_dtype) in enumerate(layout)
+                    ]
+                )
+                shape = (len(indices),)
+            tmp_path = "{}.{}.tmp".format(path, os.getpid())
+            try:
+                if format == "npy":
+                    out = numpy.lib.format.open_memmap(
+                        tmp_path, "w+", dtype, shape
+                    )
+                else:
+                    out = numpy.memmap(tmp_path, dtype, "w+", shape=shape)
+                self._export_into(out, indices, crop, flush_size)
+                del out
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.isfile(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        if format == "npy":
+            return numpy.load(path, mmap_mode="r")
+        return numpy.memmap(path, dtype, "r", shape=shape)
+
+    def _export_into(self, out, indices, crop, flush_size):
+        buf = (
+            out
+            if out.dtype.names is None
+            else [out[name] for name in out.dtype.names]
+        )
+        frame_size = out.nbytes // len(out)
+        pending = [0]
+
+        def get_item(i):
+            # Writing back dirty pages as we go keeps memory use bounded.
+            pending[0] += frame_size
+            if pending[0] >= flush_size:
+                out.flush()
+                pending[0] = 0
+            return _get_frame_buffer_item(buf, i)
+
+        self._get_frames_into(indices, get_item, crop)
+        out.flush()
+
+    def iter_frames_parallel(
+        self,
+        start=0,
+        end=None,
+        workers=None,
+        max_pending=None,
+        min_segment=32,
+        num_threads=1,
+        crop=False,
+        max_segment=256,
+    ):
+        """Iterate over video frames decoded by worker processes.
+
+        The frame range is split at keyframes into segments of at least
+        min_segment frames. Longer GOPs are split into segments of at most
+        max_segment frames, at the cost of seeking within the GOP. Each
+        worker decodes whole segments with its own video source, using
+        the current input and output formats. Frames are yielded in
+        presentation order as arrays owned by the caller, with at most
+        max_pending segments decoded ahead, which bounds memory use to
+        max_pending * max_segment frames.
+        """
+        if not 0 < min_segment <= max_segment:
+            raise ValueError("must have 0 < min_segment <= max_segment")
+        num_frames = self.properties.NumFrames
+        end = num_frames if end is None else min(end, num_frames)
+        keyframes = self.track.keyframes
+        boundaries = [start]
+        for keyframe in keyframes[(keyframes > start) & (keyframes < end)]:
+            if keyframe - boundaries[-1] >= min_segment:
+                boundaries.append(int(keyframe))
+        if end > start:
+            if len(boundaries) > 1 and end - boundaries[-1] < min_segment:
+                boundaries[-1] = end
+            else:
+                boundaries.append(end)
+        segments = []
+        for first, last in zip(boundaries, boundaries[1:]):
+            # Split evenly in as few segments as possible.
+            count = -(-(last - first) // max_segment)
+            bounds = [
+                first + (last - first) * i // count for i in range(count)
+            ]
+            segments.extend(zip(bounds, bounds[1:] + [last]))
+        if not segments:
+            return
+        workers = workers or os.cpu_count() or 1
+        max_pending = max_pending or 2 * workers
+
+        # Workers read the index file, or get a serialized index.
+        index_file = self.index.index_file
+        index_data = str(index_file) if index_file else self.index.to_bytes()
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(
+            workers,
+            initializer=_init_parallel_worker,
+            initargs=(
+                str(self.index.source_file),
+                self.track_number,
+                index_data,
+                num_threads,
+                self.seek_mode,
+                self._input_format,
+                self._output_format,
+            ),
+        )
+        pending = deque()
+
+        def submit(segment):
+            future = executor.submit(_decode_parallel_segment, *segment, crop)
+            pending.append((segment, future))
+
+        try:
+            segments = iter(segments)
+            for segment in itertools.islice(segments, max_pending):
+                submit(segment)
+            while pending:
+                (first, last), future = pending.popleft()
+                frames = future.result()
+                segment = next(segments, None)
+                if segment:
+                    submit(segment)
+                for i in range(last - first):
+                    yield _get_frame_buffer_item(frames, i)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown()
+
+    def new_frame_buffer(self, count=None, crop=False):
+        """Allocate arrays for video frames in the current output format.
+
+        Return an array for single-plane formats, or a list of arrays
+        (one per plane) otherwise. If count is given, the arrays get
+        a leading axis of that length.
+        """
+        prefix = () if count is None else (count,)
+        arrays = [
+            numpy.empty(prefix + shape, dtype)
+            for shape, dtype in self._get_frame_layout(crop)
+        ]
+        return arrays[0] if len(arrays) == 1 else arrays
+
+    def _get_frame_layout(self, crop=False):
+        layout = self._frame_layouts.get(crop)
+        if layout is None:
+            arrays = self._probe_frame().arrays(
+                self.properties if crop else None
+            )
+            layout = self._frame_layouts[crop] = [
+                (array.shape, array.dtype) for array in arrays
+            ]
+        return layout
+
     def set_output_format(
         self,
         target_formats=None,
@@ -612,7 +1924,7 @@ class VideoSource(VideoType, Source):
     ):
         """Set the output format for video frames.
         """
-        frame = self.get_frame(0)
+        frame = self._probe_frame()
         if target_formats is None:
             target_formats = [
                 frame.ConvertedPixelFormat
@@ -635,23 +1947,54 @@ class VideoSource(VideoType, Source):
                 if frame.ScaledHeight > 0
                 else frame.EncodedHeight
             )
-        r = FFMS_SetOutputFormatV2(
+        r = _set_output_format(
             self._source,
-            cast(
-                (c_int * len(target_formats))(*target_formats), POINTER(c_int)
-            ),
+            target_formats,
             width,
             height,
             resizer,
-            byref(err_info),
+            byref(_get_err_info()),
         )
+        self._frame_layouts.clear()
+        self._stats.count("format_switches")
         if r:
             raise Error
+        self._output_format = (tuple(target_formats), width, height, resizer)
+
+    @contextlib.contextmanager
+    def _temporary_output_format(
+        self, target_formats=None, width=None, height=None, resizer=None
+    ):
+        # Use the given output format if any, then restore the previous one.
+        output_format = self._output_format
+        if (
+            target_formats is not None
+            or width is not None
+            or height is not None
+        ):
+            self.set_output_format(target_formats, width, height, resizer)
+        try:
+            yield
+        finally:
+            if output_format != self._output_format:
+                self._apply_output_format(output_format)
+
+    def _apply_output_format(self, output_format):
+        if output_format:
+            target_formats, width, height, resizer = output_format
+            self.set_output_format(
+                list(target_formats), width, height, resizer
+            )
+        else:
+            self.reset_output_format()
 
     def reset_output_format(self):
         """Reset the video output format.
         """
         FFMS_ResetOutputFormatV(self._source)
+        self._frame_layouts.clear()
+        self._stats.count("format_switches")
+        self._output_format = None
 
     @contextlib.contextmanager
     def output_format(
@@ -680,15 +2023,21 @@ class VideoSource(VideoType, Source):
             color_space,
             color_range,
             pixel_format,
-            byref(err_info),
+            byref(_get_err_info()),
         )
+        self._frame_layouts.clear()
+        self._stats.count("format_switches")
         if r:
             raise Error
+        self._input_format = (color_space, color_range, pixel_format)
 
     def reset_input_format(self):
         """Reset the video input format.
         """
         FFMS_ResetInputFormatV(self._source)
+        self._frame_layouts.clear()
+        self._stats.count("format_switches")
+        self._input_format = None
 
     @contextlib.contextmanager
     def input_format(
@@ -712,10 +2061,264 @@ class VideoSource(VideoType, Source):
                 FFMS_GetTrackFromVideo(self._source),
                 self.track_number,
                 self.index,
+                self,
             )
         return self._track
 
 
+FrameCacheInfo = namedtuple(
+    "FrameCacheInfo",
+    ("hits", "misses", "evictions", "count", "size", "max_size"),
+)
+
+
+class VideoSourcePool(_Closable):
+    """Pool of video sources decoding the same track
+
+    Each request goes to the source whose last decoded frame is the
+    closest before the requested one in the same GOP, so that it keeps
+    decoding forward. Otherwise, a new source is created, up to size
+    sources, or the least recently used idle source has to seek.
+    """
+
+    def __init__(
+        self,
+        source_file,
+        size=4,
+        track_number=None,
+        index=None,
+        num_threads=0,
+        seek_mode=FFMS_SEEK_NORMAL,
+        target_formats=None,
+        width=None,
+        height=None,
+        resizer=FFMS_RESIZER_BICUBIC,
+    ):
+        """Create a pool of at most size video sources.
+        """
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.size = size
+        self._source_args = (num_threads, seek_mode)
+        self._output_format = (target_formats, width, height, resizer)
+        self._condition = threading.Condition()
+        self._async_semaphore = None
+        # Least recently used first
+        self._idle = []
+        self._num_sources = 1
+        source = self._new_source(source_file, track_number, index)
+        self.source_file = source_file
+        self.track_number = source.track_number
+        self.index = source.index
+        # The index is shared by the sources, so the pool closes it.
+        self._owns_index, source._owns_index = source._owns_index, False
+        self._keyframes = source.track.keyframes.tolist()
+        self._idle.append(source)
+
+    def __len__(self):
+        return self._num_sources
+
+    def _new_source(self, source_file, track_number, index):
+        source = VideoSource(
+            source_file, track_number, index, *self._source_args
+        )
+        target_formats, width, height, resizer = self._output_format
+        if (
+            target_formats is not None
+            or width is not None
+            or height is not None
+        ):
+            source.set_output_format(target_formats, width, height, resizer)
+        return source
+
+    @contextlib.contextmanager
+    def acquire(self, n):
+        """Context manager to use the best source to decode frame n,
+        exclusively.
+        """
+        source = self._checkout(n)
+        try:
+            yield source
+        finally:
+            with self._condition:
+                closed = self._closed
+                if not closed:
+                    self._idle.append(source)
+                    self._condition.notify()
+            if closed:
+                source.close()
+
+    def close(self):
+        """Close the idle sources now, and the others once released.
+
+        The index is closed too if the pool created it. Acquiring
+        a source afterwards raises ValueError.
+        """
+        with self._condition:
+            self._closed = True
+            sources, self._idle = self._idle, []
+            self._condition.notify_all()
+        for source in sources:
+            source.close()
+        if self._owns_index:
+            self.index.close()
+
+    def get_frame_copy(self, n, crop=False):
+        """Decode a given video frame with the best source.
+
+        Return a copy of the frame, as allocated by new_frame_buffer().
+        """
+        with self.acquire(n) as source:
+            return source._get_frame_copy(n, crop)
+
+    async def get_frame_async(self, n, crop=False):
+        """Decode a given video frame with the best source, without
+        blocking the event loop.
+        """
+        # Calls beyond the pool size wait on the event loop rather than
+        # in executor threads.
+        loop = asyncio.get_running_loop()
+        if (
+            self._async_semaphore is None
+            or self._async_semaphore[0] is not loop
+        ):
+            self._async_semaphore = (loop, asyncio.Semaphore(self.size))
+        return await _run_async(
+            self.get_frame_copy, n, crop, lock=self._async_semaphore[1]
+        )
+
+    def _checkout(self, n):
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise ValueError("pool is closed")
+                i = self._find_source(n)
+                if i is not None:
+                    return self._idle.pop(i)
+                if self._num_sources < self.size:
+                    self._num_sources += 1
+                    break
+                if self._idle:
+                    return self._idle.pop(0)
+                self._condition.wait()
+        # Sources are slow to create, so do it without holding the lock.
+        try:
+            return self._new_source(
+                self.source_file, self.track_number, self.index
+            )
+        except BaseException:
+            with self._condition:
+                self._num_sources -= 1
+                self._condition.notify()
+            raise
+
+    def _find_source(self, n):
+        # Find the idle source that can reach frame n by decoding the
+        # fewest frames forward, without seeking.
+        # Failing that, find an unused source, which has no position
+        # worth keeping.
+        gop = bisect.bisect_right(self._keyframes, n)
+        best = best_distance = unused = None
+        for i, source in enumerate(self._idle):
+            last_frame = source._last_frame
+            if last_frame is None:
+                if unused is None:
+                    unused = i
+            elif (
+                last_frame <= n
+                and bisect.bisect_right(self._keyframes, last_frame) == gop
+                and (best is None or n - last_frame < best_distance)
+            ):
+                best, best_distance = i, n - last_frame
+        return unused if best is None else best
+
+
+class _FrameCache:
+    """Byte-budgeted LRU cache of decoded frames
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            arrays = self._frames.get(key)
+            if arrays is None:
+                self.misses += 1
+            else:
+                self._frames.move_to_end(key)
+                self.hits += 1
+            return arrays
+
+    def put(self, key, arrays):
+        size = sum(array.nbytes for array in arrays)
+        if size > self.max_size:
+            return
+        with self._lock:
+            old_arrays = self._frames.pop(key, None)
+            if old_arrays is not None:
+                self.size -= sum(array.nbytes for array in old_arrays)
+            self._frames[key] = arrays
+            self.size += size
+            self._evict()
+
+    def resize(self, max_size):
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+
+    def info(self):
+        with self._lock:
+            return FrameCacheInfo(
+                self.hits,
+                self.misses,
+                self.evictions,
+                len(self._frames),
+                self.size,
+                self.max_size,
+            )
+
+    def _evict(self):
+        while self.size > self.max_size:
+            _, arrays = self._frames.popitem(last=False)
+            self.size -= sum(array.nbytes for array in arrays)
+            self.evictions += 1
+
+
+_parallel_source = None
+
+
+def _init_parallel_worker(
+    source_file,
+    track_number,
+    index_data,
+    num_threads,
+    seek_mode,
+    input_format,
+    output_format,
+):
+    global _parallel_source
+    if isinstance(index_data, str):
+        index = Index.read(index_data)
+    else:
+        index = Index.from_bytes(index_data, source_file)
+    _parallel_source = VideoSource(
+        source_file, track_number, index, num_threads, seek_mode,
+    )
+    if input_format:
+        _parallel_source.set_input_format(*input_format)
+    if output_format:
+        _parallel_source._apply_output_format(output_format)
+
+
+def _decode_parallel_segment(start, end, crop):
+    return _parallel_source.get_frames(range(start, end), crop)
+
+
 def _get_planes(frame):
     height = (
         frame.ScaledHeight if frame.ScaledHeight > 0 else frame.EncodedHeight
@@ -733,7 +2336,157 @@ def _get_planes(frame):
     ]
 
 
+def _make_pix_fmt_layouts():
+    """Plane layouts of common pixel formats by name.
+
+    A layout is a tuple of a numpy dtype and, for each plane, the log2
+    horizontal and vertical subsampling and the number of components.
+    """
+    depths = [("", "u1")] + [
+        ("{}{}".format(bits, endian), ("<u2" if endian == "le" else ">u2"))
+        for bits in (9, 10, 12, 14, 16)
+        for endian in ("le", "be")
+    ]
+    subsamplings = {
+        "420": (1, 1),
+        "422": (1, 0),
+        "444": (0, 0),
+        "440": (0, 1),
+        "411": (2, 0),
+        "410": (2, 1),
+    }
+    layouts = {}
+    for depth, dtype in depths:
+        for name, (w, h) in subsamplings.items():
+            chroma = [(0, 0, 1), (w, h, 1), (w, h, 1)]
+            layouts["yuv{}p{}".format(name, depth)] = (dtype, chroma)
+            layouts["yuva{}p{}".format(name, depth)] = (
+                dtype,
+                chroma + [(0, 0, 1)],
+            )
+        layouts["gray{}".format(depth)] = (dtype, [(0, 0, 1)])
+        layouts["gbrp{}".format(depth)] = (dtype, [(0, 0, 1)] * 3)
+        layouts["gbrap{}".format(depth)] = (dtype, [(0, 0, 1)] * 4)
+    for name, (w, h) in subsamplings.items():
+        layouts["yuvj{}p".format(name)] = layouts["yuv{}p".format(name)]
+    for name, (w, h) in [("nv12", (1, 1)), ("nv16", (1, 0)), ("nv24", (0, 0))]:
+        layouts[name] = ("u1", [(0, 0, 1), (w, h, 2)])
+    layouts["nv21"] = layouts["nv12"]
+    layouts["nv42"] = layouts["nv24"]
+    for name in ["p010", "p016"]:
+        for endian in ("le", "be"):
+            layouts[name + endian] = (
+                "<u2" if endian == "le" else ">u2",
+                [(0, 0, 1), (1, 1, 2)],
+            )
+    for name in ["yuyv422", "uyvy422", "yvyu422"]:
+        layouts[name] = ("u1", [(0, 0, 2)])
+    for name in ["rgb24", "bgr24"]:
+        layouts[name] = ("u1", [(0, 0, 3)])
+    for name in [
+        "rgba",
+        "bgra",
+        "argb",
+        "abgr",
+        "rgb0",
+        "bgr0",
+        "0rgb",
+        "0bgr",
+    ]:
+        layouts[name] = ("u1", [(0, 0, 4)])
+    for endian in ("le", "be"):
+        dtype = "<u2" if endian == "le" else ">u2"
+        for name in ["rgb48", "bgr48"]:
+            layouts[name + endian] = (dtype, [(0, 0, 3)])
+        for name in ["rgba64", "bgra64"]:
+            layouts[name + endian] = (dtype, [(0, 0, 4)])
+    return layouts
+
+
+_pix_fmt_layouts = None
+
+
+def _get_pix_fmt_layout(pix_fmt):
+    global _pix_fmt_layouts
+    if _pix_fmt_layouts is None:
+        layouts = {}
+        for name, layout in _make_pix_fmt_layouts().items():
+            n = get_pix_fmt(name)
+            if n >= 0:
+                layouts.setdefault(n, layout)
+        _pix_fmt_layouts = layouts
+    try:
+        return _pix_fmt_layouts[pix_fmt]
+    except KeyError:
+        raise ValueError(
+            "unsupported pixel format: {}".format(pix_fmt)
+        ) from None
+
+
+def _get_arrays(frame, crop=None):
+    """Return the planes as shaped arrays.
+
+    Arrays are views on the frame data, using the plane dimensions and
+    the line size as row stride. Packed formats have a third axis for
+    components. If crop is given (e.g. video source properties),
+    its Crop* values are applied.
+    """
+    pix_fmt = (
+        frame.ConvertedPixelFormat
+        if frame.ConvertedPixelFormat >= 0
+        else frame.EncodedPixelFormat
+    )
+    dtype, planes = _get_pix_fmt_layout(pix_fmt)
+    dtype = numpy.dtype(dtype)
+    width = frame.ScaledWidth if frame.ScaledWidth > 0 else frame.EncodedWidth
+    height = (
+        frame.ScaledHeight if frame.ScaledHeight > 0 else frame.EncodedHeight
+    )
+    arrays = []
+    for n, (w_shift, h_shift, components) in enumerate(planes):
+        linesize = frame.Linesize[n]
+        plane_width = -(-width >> w_shift)
+        plane_height = -(-height >> h_shift)
+        if components == 1:
+            shape = (plane_height, plane_width)
+            strides = (linesize, dtype.itemsize)
+        else:
+            shape = (plane_height, plane_width, components)
+            strides = (linesize, dtype.itemsize * components, dtype.itemsize)
+        array = numpy.ndarray(
+            shape,
+            dtype,
+            cast(frame.Data[n], POINTER(linesize * plane_height * c_uint8))[0],
+            strides=strides,
+        )
+        if crop is not None:
+            top = crop.CropTop * plane_height // frame.EncodedHeight
+            bottom = crop.CropBottom * plane_height // frame.EncodedHeight
+            left = crop.CropLeft * plane_width // frame.EncodedWidth
+            right = crop.CropRight * plane_width // frame.EncodedWidth
+            array = array[
+                top : plane_height - bottom, left : plane_width - right
+            ]
+        arrays.append(array)
+    return arrays
+
+
 FFMS_Frame.planes = property(_get_planes)
+FFMS_Frame.arrays = _get_arrays
+
+
+def _get_frame_buffer_item(buf, index):
+    if isinstance(buf, numpy.ndarray):
+        return buf[index]
+    return [array[index] for array in buf]
+
+
+def _copy_frame_buffer(dst, src):
+    if isinstance(dst, numpy.ndarray):
+        numpy.copyto(dst, src)
+    else:
+        for dst_array, src_array in zip(dst, src):
+            numpy.copyto(dst_array, src_array)
 
 
 def _get_fps(properties):
@@ -758,14 +2511,8 @@ class AudioSource(AudioType, Source):
     """
 
     _DEFAULT_RATE = 100
-    _SAMPLE_TYPES = [
-        numpy.uint8,
-        numpy.int16,
-        numpy.int32,
-        numpy.float32,
-        numpy.float64,
-    ]
-    _FFMS_DestroyAudioSource = FFMS_DestroyAudioSource
+    _STATS_CALLS = ("get_audio",)
+    _SAMPLE_TYPES = ["u1", "i2", "i4", "f4", "f8"]
 
     def __init__(
         self,
@@ -777,20 +2524,48 @@ class AudioSource(AudioType, Source):
         """Create an audio source object.
         """
         super().__init__(source_file, track_number, index)
-        self._source = FFMS_CreateAudioSource(
+        self.delay_mode = delay_mode
+        self._next_sample = None
+        self._open()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["delay_mode"] = self.delay_mode
+        if hasattr(self, "audio"):
+            state["audio"] = self.audio
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.delay_mode = state["delay_mode"]
+        self._next_sample = None
+        if "audio" in state:
+            self.count = len(state["audio"])
+            self.audio = state["audio"]
+            self.buf = self.audio.ctypes.data_as(c_void_p)
+
+    def _open(self):
+        source = FFMS_CreateAudioSource(
             get_encoded_path(self.index.source_file),
             self.track_number,
             self.index._index,
-            delay_mode,
-            byref(err_info),
+            self.delay_mode,
+            byref(_get_err_info()),
         )
-        if not self._source:
+        if not source:
             raise Error
-        self.properties = FFMS_GetAudioProperties(self._source)[0]
-        self.sample_type = self._SAMPLE_TYPES[self.properties.SampleFormat]
+        self._handle = self._own_handle(source, FFMS_DestroyAudioSource)
+        self._properties = FFMS_GetAudioProperties(source)[0]
+        self._sample_type = numpy.dtype(
+            self._SAMPLE_TYPES[self._properties.SampleFormat]
+        ).type
 
-    def __del__(self):
-        self._FFMS_DestroyAudioSource(self._source)
+    @property
+    def sample_type(self):
+        """NumPy type of the audio samples
+        """
+        self._get_source()
+        return self._sample_type
 
     def init_buffer(self, count=1):
         """Initialize the buffer for get_audio().
@@ -801,21 +2576,181 @@ class AudioSource(AudioType, Source):
         )
         self.buf = self.audio.ctypes.data_as(c_void_p)
 
-    def get_audio(self, start):
+    def get_audio(self, start, count=None, out=None):
         """Decode a number of audio samples.
+
+        Without count and out, the buffer from init_buffer() is used.
+        Otherwise, samples are decoded into out, an array of shape
+        (count, channels) that is allocated if not given.
+        """
+        if out is None:
+            if count is None:
+                out = self.audio
+            else:
+                out = numpy.empty(
+                    (count, self.properties.Channels), self.sample_type
+                )
+        else:
+            self._check_buffer(out)
+            if count is not None:
+                if count > len(out):
+                    raise ValueError("output buffer too small")
+                out = out[:count]
+        self._read_audio(out, start)
+        return out
+
+    async def get_audio_async(self, start, count=None, out=None):
+        """Decode a number of audio samples without blocking the event
+        loop, as get_audio() does.
         """
+        return await self._run_locked_async(self.get_audio, start, count, out)
+
+    def _check_buffer(self, out):
+        if (
+            out.dtype != self.sample_type
+            or out.ndim != 2
+            or out.shape[1] != self.properties.Channels
+            or not out.flags.c_contiguous
+            or not out.flags.writeable
+        ):
+            raise ValueError(
+                "output buffer must be a writable C-contiguous {} array "
+                "of shape (count, {})".format(
+                    numpy.dtype(self.sample_type).name,
+                    self.properties.Channels,
+                )
+            )
+
+    def _read_audio(self, out, start):
+        stats = self._stats
+        if self._next_sample is not None and start != self._next_sample:
+            stats.count("seeks")
+        self._next_sample = start + len(out)
+        start_time = _clock()
         # FFMS 2.17: ReadPacket error or even core dump
         # for random accesses under Linux?
         if FFMS_GetAudio(
-            self._source, self.buf, start, self.count, byref(err_info)
+            self._source,
+            out.ctypes.data_as(c_void_p),
+            start,
+            len(out),
+            byref(_get_err_info()),
         ):
+            stats.count("errors")
+            self._next_sample = None
             raise Error
-        return self.audio
+        stats.observe("get_audio", _clock() - start_time)
 
-    def linear_access(self, start=0, end=None, rate=_DEFAULT_RATE):
+    def linear_access(self, start=0, end=None, rate=_DEFAULT_RATE, out=None):
         """Return a linear iterator over the audio samples.
+
+        If out is given, chunks are decoded into consecutive slices of it,
+        wrapping around to its start when a chunk doesn't fit, so it can
+        be used as a ring buffer or hold a whole interval.
         """
-        return AudioLinearAccess(self, start, end, rate)
+        return AudioLinearAccess(self, start, end, rate, out)
+
+    def compute_peaks(
+        self,
+        block_size=256,
+        factor=4,
+        levels=None,
+        peaks_file=None,
+        overwrite=False,
+    ):
+        """Compute min/max/RMS waveform peaks at several zoom levels.
+
+        Level 0 has one entry per block_size samples, and each further
+        level merges factor entries of the previous one. Peaks are
+        stored in a .npy file next to the index file, or in the index
+        cache directory if that isn't writable. The file is
+        memory-mapped instead of decoding again on later calls.
+        """
+        if block_size < 1 or factor < 2:
+            raise ValueError("block_size must be >= 1 and factor >= 2")
+        level_sizes = _get_peak_level_sizes(
+            self.properties.NumSamples, block_size, factor, levels
+        )
+        shape = (sum(level_sizes), self.properties.Channels)
+        if not peaks_file:
+            peaks_file = self._get_peaks_file(
+                "peaks-{}-{}-{}".format(block_size, factor, len(level_sizes))
+            )
+        if not overwrite and _is_newer(peaks_file, self.index.source_file):
+            try:
+                peaks = numpy.load(peaks_file, mmap_mode="r")
+            except (OSError, ValueError):
+                peaks = None
+            if (
+                peaks is not None
+                and peaks.dtype == numpy.dtype(_PEAKS_DTYPE)
+                and peaks.shape == shape
+            ):
+                return AudioPeaks(peaks, block_size, factor, level_sizes)
+        tmp_file = "{}.{}.tmp".format(peaks_file, os.getpid())
+        try:
+            peaks = numpy.lib.format.open_memmap(
+                tmp_file, "w+", _PEAKS_DTYPE, shape
+            )
+            self._compute_peaks(peaks, block_size, factor, level_sizes)
+            peaks.flush()
+            del peaks
+            os.replace(tmp_file, peaks_file)
+        except BaseException:
+            if os.path.isfile(tmp_file):
+                os.remove(tmp_file)
+            raise
+        peaks = numpy.load(peaks_file, mmap_mode="r")
+        return AudioPeaks(peaks, block_size, factor, level_sizes)
+
+    def _get_peaks_file(self, ext):
+        peaks_file = self.track._get_output_file(ext, "npy")
+        cache = get_index_cache()
+        if (
+            cache
+            and not _is_newer(peaks_file, self.index.source_file)
+            and not os.access(
+                os.path.dirname(os.path.abspath(peaks_file)), os.W_OK
+            )
+        ):
+            # Read-only media: use the index cache directory,
+            # keyed like the index.
+            os.makedirs(cache.cache_dir, exist_ok=True)
+            peaks_file = self.track._get_output_file(
+                ext, "npy", cache.get_index_file(self.index.source_file)
+            )
+        return peaks_file
+
+    def _compute_peaks(self, peaks, block_size, factor, level_sizes):
+        num_samples = self.properties.NumSamples
+        chunk_size = block_size * max(1, (1 << 20) // block_size)
+        audio = numpy.empty(
+            (min(chunk_size, num_samples), self.properties.Channels),
+            self.sample_type,
+        )
+        row = 0
+        for start in range(0, num_samples, chunk_size):
+            count = min(chunk_size, num_samples - start)
+            chunk = self.get_audio(start, out=audio[:count])
+            num_blocks = -(-count // block_size)
+            _reduce_peak_blocks(
+                peaks[row : row + num_blocks],
+                chunk,
+                numpy.arange(0, count, block_size),
+            )
+            row += num_blocks
+        weights = numpy.full(level_sizes[0], block_size, numpy.float64)
+        if num_samples:
+            weights[-1] = num_samples - (level_sizes[0] - 1) * block_size
+        src = 0
+        for size in level_sizes[1:]:
+            dst = src + len(weights)
+            offsets = numpy.arange(0, len(weights), factor)
+            _merge_peak_blocks(
+                peaks[dst : dst + size], peaks[src:dst], weights, offsets
+            )
+            weights = numpy.add.reduceat(weights, offsets)
+            src = dst
 
     @property
     def track(self):
@@ -826,6 +2761,7 @@ class AudioSource(AudioType, Source):
                 FFMS_GetTrackFromAudio(self._source),
                 self.track_number,
                 self.index,
+                self,
             )
         return self._track
 
@@ -840,8 +2776,12 @@ class AudioLinearAccess(Sized, Iterable):
         start_frame=0,
         end_frame=None,
         rate=AudioSource._DEFAULT_RATE,
+        out=None,
     ):
+        if out is not None:
+            parent._check_buffer(out)
         self.parent = parent
+        self.out = out
         self.num_samples = parent.properties.NumSamples
         self.start_frame = (
             self.num_samples + start_frame if start_frame < 0 else start_frame
@@ -877,76 +2817,181 @@ class AudioLinearAccess(Sized, Iterable):
         return math.ceil(self.num_samples / self.samples_per_frame)
 
     def __iter__(self):
-        source = self.parent._source
-        l, count_l = self.l, self.count_l
-        audio_l = numpy.empty(
-            (count_l, self.parent.properties.Channels), self.parent.sample_type
-        )
-        buf_l = audio_l.ctypes.data_as(c_void_p)
+        out = self.out
+        ring = out is not None
+        if not ring:
+            out = numpy.empty(
+                (
+                    self.count_l if self.l is None else self.count_h,
+                    self.parent.properties.Channels,
+                ),
+                self.parent.sample_type,
+            )
+        pos = 0
+        for p, count in self._iter_chunks():
+            if pos + count > len(out):
+                if count > len(out):
+                    raise ValueError("output buffer too small")
+                pos = 0
+            audio = out[pos : pos + count]
+            self.parent._read_audio(audio, p)
+            yield audio
+            if ring:
+                pos += count
+
+    def _iter_chunks(self):
         p = self.start_frame
         end = self.end_frame
-        if l is None:
-            np = p + count_l
-            while np <= end:
-                if FFMS_GetAudio(source, buf_l, p, count_l, byref(err_info)):
-                    raise Error
-                yield audio_l
-                p = np
-                np = p + count_l
+        if self.l is None:
+            counts = [(1, self.count_l)]
         else:
-            h, count_h = self.h, self.count_h
-            audio_h = numpy.empty(
-                (count_h, self.parent.properties.Channels),
-                self.parent.sample_type,
+            counts = [(self.h, self.count_h), (self.l, self.count_l)]
+        loop = True
+        while loop:
+            for n, count in counts:
+                for _ in range(n):
+                    if p + count > end:
+                        loop = False
+                        break
+                    yield p, count
+                    p += count
+        if end > p:
+            yield p, end - p
+
+
+_PEAKS_DTYPE = [("min", "f4"), ("max", "f4"), ("rms", "f4")]
+
+
+def _get_peak_level_sizes(num_samples, block_size, factor, levels=None):
+    sizes = [-(-num_samples // block_size)]
+    while (levels is None and sizes[-1] > 1) or (
+        levels is not None and len(sizes) < levels
+    ):
+        sizes.append(-(-sizes[-1] // factor))
+    return sizes
+
+
+def _is_newer(path, other_path):
+    try:
+        return os.path.getmtime(path) >= os.path.getmtime(other_path)
+    except OSError:
+        return False
+
+
+def _reduce_peak_blocks(dst, audio, offsets):
+    audio = audio.astype(numpy.float32)
+    counts = numpy.diff(numpy.append(offsets, len(audio)))[:, None]
+    dst["min"] = numpy.minimum.reduceat(audio, offsets)
+    dst["max"] = numpy.maximum.reduceat(audio, offsets)
+    numpy.square(audio, out=audio)
+    dst["rms"] = numpy.sqrt(numpy.add.reduceat(audio, offsets) / counts)
+
+
+def _merge_peak_blocks(dst, src, weights, offsets):
+    weights = weights[:, None]
+    dst["min"] = numpy.minimum.reduceat(src["min"], offsets)
+    dst["max"] = numpy.maximum.reduceat(src["max"], offsets)
+    dst["rms"] = numpy.sqrt(
+        numpy.add.reduceat(numpy.square(src["rms"]) * weights, offsets)
+        / numpy.add.reduceat(weights, offsets)
+    )
+
+
+class AudioPeaks:
+    """Multi-resolution waveform peaks of an audio source
+
+    levels[k] is a structured array with "min", "max" and "rms" fields
+    of shape (blocks, channels), each block covering block_sizes[k]
+    samples.
+    """
+
+    def __init__(self, peaks, block_size, factor, level_sizes):
+        self.peaks = peaks
+        self.block_sizes = [
+            block_size * factor ** k for k in range(len(level_sizes))
+        ]
+        self.levels = []
+        row = 0
+        for size in level_sizes:
+            self.levels.append(peaks[row : row + size])
+            row += size
+
+    def __len__(self):
+        return len(self.levels)
+
+    def get_level(self, samples_per_pixel):
+        """Get the coarsest level whose blocks cover at most
+        samples_per_pixel samples.
+        """
+        k = max(
+            bisect.bisect_right(self.block_sizes, samples_per_pixel) - 1, 0
+        )
+        return self.levels[k]
+
+
+_FRAME_INFO_DTYPE = [("PTS", "i8"), ("RepeatPict", "i4"), ("KeyFrame", "i4")]
+
+
+def _get_frame_info_array(track):
+    num_frames = FFMS_GetNumFrames(track)
+    frame_info_array = numpy.empty(num_frames, _FRAME_INFO_DTYPE)
+    size = frame_info_array.itemsize
+    if size != sizeof(FFMS_FrameInfo):
+        raise RuntimeError("FFMS_FrameInfo doesn't match the numpy layout")
+    if num_frames:
+        first = addressof(FFMS_GetFrameInfo(track, 0).contents)
+        # The FFMS_FrameInfo of the library may be larger than the binding's.
+        stride = (
+            addressof(FFMS_GetFrameInfo(track, 1).contents) - first
+            if num_frames > 1
+            else size
+        )
+        last = addressof(FFMS_GetFrameInfo(track, num_frames - 1).contents)
+        if stride >= size and last - first == (num_frames - 1) * stride:
+            # Frame information is stored as an array: copy it at once
+            # through a strided view.
+            buf = (c_char * ((num_frames - 1) * stride + size)).from_address(
+                first
             )
-            buf_h = audio_h.ctypes.data_as(c_void_p)
-            loop = True
-            while loop:
-                for n, count, audio, buf in [
-                    (h, count_h, audio_h, buf_h),
-                    (l, count_l, audio_l, buf_l),
-                ]:
-                    for _ in range(n):
-                        np = p + count
-                        if np > end:
-                            loop = False
-                            break
-                        if FFMS_GetAudio(
-                            source, buf, p, count, byref(err_info)
-                        ):
-                            raise Error
-                        yield audio
-                        p = np
-        count = end - p
-        if count:
-            audio = numpy.empty(
-                (count, self.parent.properties.Channels),
-                self.parent.sample_type,
+            frame_info_array[:] = numpy.ndarray(
+                num_frames, _FRAME_INFO_DTYPE, buf, strides=(stride,)
             )
-            buf = audio.ctypes.data_as(c_void_p)
-            if FFMS_GetAudio(source, buf, p, count, byref(err_info)):
-                raise Error
-            yield audio
+        else:
+            data = frame_info_array.ctypes.data
+            for n in range(num_frames):
+                memmove(data + n * size, FFMS_GetFrameInfo(track, n), size)
+    frame_info_array.flags.writeable = False
+    return frame_info_array
 
 
 class Track:
     """FFMS_Track
     """
 
-    def __init__(self, track, number, index):
-        self._track = track
+    def __init__(self, track, number, index, owner=None):
+        self._handle = track
         self.number = number
         self.index = index
+        # The index or source the track belongs to.
+        self._owner = index if owner is None else owner
+        self._frame_info_array = None
         self._frame_info_list = None
 
     @classmethod
-    def create(cls, track, number, index):
+    def create(cls, track, number, index, owner=None):
         t = FFMS_GetTrackType(track)
         for c in cls.__subclasses__():
             if c.type == t:
                 cls = c
                 break
-        return cls(track, number, index)
+        return cls(track, number, index, owner)
+
+    @property
+    def _track(self):
+        # The track is freed with its owner.
+        if self._owner.closed:
+            raise ValueError("track is closed")
+        return self._handle
 
     @property
     def type(self):  # @ReservedAssignment
@@ -954,22 +2999,35 @@ class Track:
         """
         return FFMS_GetTrackType(self._track)
 
+    @property
+    def frame_info_array(self):
+        """Frame information as a read-only numpy structured array
+        """
+        if self._frame_info_array is None:
+            self._frame_info_array = _get_frame_info_array(self._track)
+        return self._frame_info_array
+
     @property
     def frame_info_list(self):
         """List of frame information
         """
         if self._frame_info_list is None:
-            self._frame_info_list = [
-                FFMS_GetFrameInfo(self._track, n)[0]
-                for n in range(FFMS_GetNumFrames(self._track))
-            ]
+            frame_info_array = self.frame_info_array
+            self._frame_info_list = list(
+                (FFMS_FrameInfo * len(frame_info_array)).from_buffer_copy(
+                    frame_info_array
+                )
+            )
         return self._frame_info_list
 
-    def _get_output_file(self, ext):
-        index_file = (
-            self.index.index_file or self.index.source_file + FFINDEX_EXT
+    def _get_output_file(self, ext, suffix="txt", index_file=None):
+        if not index_file:
+            index_file = (
+                self.index.index_file or self.index.source_file + FFINDEX_EXT
+            )
+        return "{}_track{:02}.{}.{}".format(
+            index_file, self.number, ext, suffix
         )
-        return "{}_track{:02}.{}.txt".format(index_file, self.number, ext)
 
 
 class VideoTrack(VideoType, Track):
@@ -978,9 +3036,12 @@ class VideoTrack(VideoType, Track):
 
     _KEYFRAME_FORMAT_VERSION = 1
 
-    def __init__(self, track, number, index):
-        super().__init__(track, number, index)
+    def __init__(self, track, number, index, owner=None):
+        super().__init__(track, number, index, owner)
         self._timecodes = None
+        self._exact_timecodes = None
+        self._keyframes = None
+        self._keyframes_as_timecodes = None
 
     @property
     def time_base(self):
@@ -991,42 +3052,90 @@ class VideoTrack(VideoType, Track):
 
     @property
     def timecodes(self):
-        """List of timecodes
+        """Array of timecodes in milliseconds
         """
         if self._timecodes is None:
             time_base = self.time_base
             num, den = time_base.numerator, time_base.denominator
-            self._timecodes = [
-                frame_info.PTS * num / den
-                for frame_info in self.frame_info_list
-            ]
+            timecodes = self.frame_info_array["PTS"] * num / den
+            timecodes.flags.writeable = False
+            self._timecodes = timecodes
         return self._timecodes
 
+    @property
+    def exact_timecodes(self):
+        """List of timecodes in milliseconds as exact fractions
+        """
+        if self._exact_timecodes is None:
+            time_base = self.time_base
+            self._exact_timecodes = [
+                pts * time_base
+                for pts in self.frame_info_array["PTS"].tolist()
+            ]
+        return self._exact_timecodes
+
     def write_timecodes(self, timecodes_file=None):
         """Write timecodes to disk.
         """
         if not timecodes_file:
             timecodes_file = self._get_output_file("tc")
         if FFMS_WriteTimecodes(
-            self._track, get_encoded_path(timecodes_file), byref(err_info)
+            self._track,
+            get_encoded_path(timecodes_file),
+            byref(_get_err_info()),
         ):
             raise Error
 
     @property
     def keyframes(self):
-        """List of keyframe positions
+        """Array of keyframe positions
         """
-        return [
-            n
-            for n in range(len(self.frame_info_list))
-            if self.frame_info_list[n].KeyFrame
-        ]
+        if self._keyframes is None:
+            keyframes = numpy.flatnonzero(self.frame_info_array["KeyFrame"])
+            keyframes.flags.writeable = False
+            self._keyframes = keyframes
+        return self._keyframes
 
     @property
     def keyframes_as_timecodes(self):
-        """List of keyframes as timecodes
+        """Array of keyframes as timecodes in milliseconds
         """
-        return [self.timecodes[n] for n in self.keyframes]
+        if self._keyframes_as_timecodes is None:
+            keyframes_as_timecodes = self.timecodes[self.keyframes]
+            keyframes_as_timecodes.flags.writeable = False
+            self._keyframes_as_timecodes = keyframes_as_timecodes
+        return self._keyframes_as_timecodes
+
+    def frame_at_time(self, times):
+        """Get the frames displayed at given timecodes (in milliseconds),
+        without decoding.
+        """
+        frames = _snap(self.timecodes, times, "backward")
+        return frames if numpy.ndim(times) else frames.item()
+
+    def time_of_frame(self, frames):
+        """Get the timecodes (in milliseconds) of given frames.
+        """
+        times = self.timecodes[numpy.asarray(frames, numpy.intp)]
+        return times if numpy.ndim(frames) else times.item()
+
+    def snap_to_keyframe(self, times, direction="nearest"):
+        """Snap timecodes (in milliseconds) to keyframe timecodes.
+
+        direction is "backward", "forward" or "nearest".
+        """
+        targets = self.keyframes_as_timecodes
+        snapped = targets[_snap(targets, times, direction)]
+        return snapped if numpy.ndim(times) else snapped.item()
+
+    def snap_to_frame_boundary(self, times, direction="nearest"):
+        """Snap timecodes (in milliseconds) to frame timecodes.
+
+        direction is "backward", "forward" or "nearest".
+        """
+        targets = self.timecodes
+        snapped = targets[_snap(targets, times, direction)]
+        return snapped if numpy.ndim(times) else snapped.item()
 
     def write_keyframes(self, keyframes_file=None):
         """Write keyframe numbers to disk.
@@ -1060,6 +3169,31 @@ class VideoTrack(VideoType, Track):
             )
 
 
+def _snap(targets, values, direction):
+    """Find the indices of sorted targets matching the given values.
+    """
+    if not len(targets):
+        raise ValueError("no frames")
+    values = numpy.asarray(values, numpy.float64)
+    last = len(targets) - 1
+    if direction == "backward":
+        indices = numpy.searchsorted(targets, values, "right") - 1
+    elif direction == "forward":
+        indices = numpy.searchsorted(targets, values, "left")
+    elif direction == "nearest":
+        after = numpy.clip(numpy.searchsorted(targets, values), 0, last)
+        before = numpy.clip(after - 1, 0, last)
+        indices = numpy.where(
+            values - targets[before] <= targets[after] - values, before, after
+        )
+    else:
+        raise ValueError(
+            "direction must be 'backward', 'forward' or 'nearest', "
+            "not {!r}".format(direction)
+        )
+    return numpy.clip(indices, 0, last)
+
+
 class AudioTrack(AudioType, Track):
     """FFMS_Track of type FFMS_TYPE_AUDIO
     """
@@ -2,10 +2,14 @@
 """
 
 import argparse
+import contextlib
+import glob
+import json
 import os
 import sys
 import time
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import ffms2.console_mode  # @UnusedImport
 
@@ -20,6 +24,60 @@ AV_LOGS = [
     ffms2.AV_LOG_DEBUG,
 ]
 
+# Extensions of the files indexed when expanding directories and patterns
+# (not .w64, the extension of audio dumps).
+MEDIA_EXTS = {
+    ".3g2",
+    ".3gp",
+    ".aac",
+    ".ac3",
+    ".aif",
+    ".aiff",
+    ".ape",
+    ".asf",
+    ".avi",
+    ".dts",
+    ".dv",
+    ".eac3",
+    ".f4v",
+    ".flac",
+    ".flv",
+    ".h264",
+    ".h265",
+    ".hevc",
+    ".m2t",
+    ".m2ts",
+    ".m2v",
+    ".m4a",
+    ".m4v",
+    ".mka",
+    ".mkv",
+    ".mov",
+    ".mp2",
+    ".mp3",
+    ".mp4",
+    ".mpeg",
+    ".mpg",
+    ".mts",
+    ".mxf",
+    ".nut",
+    ".oga",
+    ".ogg",
+    ".ogm",
+    ".ogv",
+    ".opus",
+    ".rm",
+    ".rmvb",
+    ".ts",
+    ".vob",
+    ".wav",
+    ".webm",
+    ".wma",
+    ".wmv",
+    ".wv",
+    ".y4m",
+}
+
 
 def init_progress_callback(
     msg="Indexing...", time_threshold=1, check_time=0.2
@@ -52,9 +110,31 @@ def parse_args():
         description=__doc__.strip(),
         prog="{} -m {}".format(os.path.basename(sys.executable), "ffms2"),
     )
-    parser.add_argument("input_file", type=str, help="input media filename")
     parser.add_argument(
-        "output_file", nargs="?", type=str, help="output index filename",
+        "input_files",
+        metavar="input",
+        nargs="+",
+        type=str,
+        help="input media filename, directory or glob pattern",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        type=str,
+        help="output index filename (single input only)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        default=1,
+        help="number of files to index in parallel",
+    )
+    parser.add_argument(
+        "--summary",
+        metavar="FILE",
+        help="write a JSON summary to FILE (- for stdout)",
     )
     parser.add_argument(
         "-f",
@@ -125,28 +205,195 @@ def parse_args():
         version="FFMS {}".format(ffms2.get_version()),
         help="show FFMS version number",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    # Backward compatibility: input_file [output_file]
+    if (
+        not args.output_file
+        and len(args.input_files) == 2
+        and os.path.isfile(args.input_files[0])
+        and is_output_file_arg(args.input_files[1])
+    ):
+        args.output_file = args.input_files.pop()
+    if args.jobs < 1:
+        parser.error("number of jobs must be positive")
+    return args
+
+
+def is_output_file_arg(path):
+    # An output file isn't a directory, a pattern or an existing media file.
+    return not (
+        os.path.isdir(path)
+        or any(c in path for c in "*?[")
+        or (os.path.exists(path) and is_media_file(path))
+    )
+
+
+def expand_input_files(patterns):
+    """Expand directories and glob patterns into a list of media files.
+    """
+    input_files = OrderedDict()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = []
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                paths.extend(
+                    os.path.join(root, name)
+                    for name in sorted(files)
+                    if is_media_file(name)
+                )
+        elif any(c in pattern for c in "*?["):
+            paths = [
+                path
+                for path in sorted(glob.glob(pattern, recursive=True))
+                if os.path.isfile(path) and is_media_file(path)
+            ]
+        else:
+            paths = [pattern]
+        for path in paths:
+            input_files[path] = None
+    return list(input_files)
+
+
+def is_media_file(path):
+    return os.path.splitext(path)[1].lower() in MEDIA_EXTS
 
 
 def main():
     args = parse_args()
-    output_file = args.output_file or args.input_file + ffms2.FFINDEX_EXT
+    input_files = expand_input_files(args.input_files)
+    if not input_files:
+        print("Error: no input files", file=sys.stderr)
+        return 2
+    if args.output_file and len(input_files) != 1:
+        print("Error: output file requires a single input", file=sys.stderr)
+        return 2
     ffms2.set_log_level(AV_LOGS[args.verbose])
-    stdout_write = sys.stdout.write if args.progress else lambda s: None
+
+    # Keep stdout for the summary.
+    with contextlib.redirect_stdout(
+        sys.stderr if args.summary == "-" else sys.stdout
+    ):
+        if len(input_files) == 1:
+            result = index_file(
+                input_files[0], args.output_file, args, args.progress
+            )
+            if result["error"]:
+                print("Error:", result["error"], file=sys.stderr)
+            results = [result]
+        elif args.jobs == 1:
+            report = init_status_report(input_files, args.progress)
+            results = []
+            for input_file in input_files:
+                result = index_file(input_file, None, args, False)
+                report(result)
+                results.append(result)
+        else:
+            results = index_files_parallel(input_files, args)
+
+    if args.summary:
+        summary = json.dumps(results, indent=2)
+        if args.summary == "-":
+            print(summary)
+        else:
+            with open(args.summary, "w") as f:
+                f.write(summary + "\n")
+
+    return 1 if any(result["status"] == "error" for result in results) else 0
+
+
+def init_status_report(input_files, progress):
+    """Return a function printing the status of each indexed file, with
+    the overall progress.
+    """
+    sizes = {
+        input_file: os.path.getsize(input_file)
+        if os.path.isfile(input_file)
+        else 0
+        for input_file in input_files
+    }
+    total_size = sum(sizes.values()) or 1
+
+    def report(result):
+        report.count += 1
+        report.done_size += sizes[result["input_file"]]
+        status = "[{}/{} {:d}%] {}: {}".format(
+            report.count,
+            len(input_files),
+            report.done_size * 100 // total_size,
+            result["input_file"],
+            result["status"],
+        )
+        if result["error"]:
+            print(status, "({})".format(result["error"]), file=sys.stderr)
+        elif progress:
+            print(status, "({:.1f}s)".format(result["elapsed"]))
+
+    report.count = 0
+    report.done_size = 0
+    return report
+
+
+def index_files_parallel(input_files, args):
+    """Index files in a pool of worker processes.
+    """
+    report = init_status_report(input_files, args.progress)
+    results = {}
+    with ProcessPoolExecutor(
+        args.jobs,
+        initializer=ffms2.set_log_level,
+        initargs=(AV_LOGS[args.verbose],),
+    ) as executor:
+        futures = {}
+        for input_file in input_files:
+            future = executor.submit(index_file, input_file, None, args, False)
+            futures[future] = input_file
+        for future in as_completed(futures):
+            input_file = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = make_result(input_file, None, "error", e, 0)
+            results[input_file] = result
+            report(result)
+    return [results[input_file] for input_file in input_files]
+
+
+def make_result(input_file, output_file, status, error, elapsed):
+    return OrderedDict(
+        [
+            ("input_file", input_file),
+            ("output_file", output_file),
+            ("status", status),
+            ("error", str(error) if error else None),
+            ("elapsed", elapsed),
+        ]
+    )
+
+
+def index_file(input_file, output_file, args, progress):
+    """Index a single file and return a summary of the result.
+    """
+    output_file = output_file or input_file + ffms2.FFINDEX_EXT
+    stdout_write = sys.stdout.write if progress else lambda s: None
+    start_time = time.time()
+    status = "indexed"
 
     try:
         if os.path.isfile(output_file) and not args.force:
-            print("Index file already exists:", output_file)
-            index = ffms2.Index.read(output_file, args.input_file)
+            if progress:
+                print("Index file already exists:", output_file)
+            index = ffms2.Index.read(output_file, input_file)
+            status = "exists"
         else:
-            indexer = ffms2.Indexer(args.input_file)
+            indexer = ffms2.Indexer(input_file)
             for track in indexer.track_info_list:
                 indexer.track_index_settings(
                     track.num,
                     track.num & args.indexing_mask,
                     track.num & args.decoding_mask,
                 )
-            ic = init_progress_callback() if args.progress else None
+            ic = init_progress_callback() if progress else None
             indexer.set_progress_callback(ic)
             index = indexer.do_indexing2(error_handling=args.error_handling)
             if ic:
@@ -166,10 +413,16 @@ def main():
                 if track.type == ffms2.FFMS_TYPE_VIDEO:
                     track.write_keyframes()
 
-    except ffms2.Error as e:
-        print("\n")
-        print("Error:", e, file=sys.stderr)
-        return 1
+    except (ffms2.Error, OSError) as e:
+        if progress:
+            print("\n")
+        return make_result(
+            input_file, output_file, "error", e, time.time() - start_time
+        )
+
+    return make_result(
+        input_file, output_file, status, None, time.time() - start_time
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,307 @@
+"""Benchmark FFMS indexing, seeking and decoding
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import OrderedDict
+
+import ffms2
+
+DEFAULT_INPUT_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "morning rescue.mkv"
+)
+
+SEEK_MODES = OrderedDict(
+    [
+        ("linear_no_rw", ffms2.FFMS_SEEK_LINEAR_NO_RW),
+        ("linear", ffms2.FFMS_SEEK_LINEAR),
+        ("normal", ffms2.FFMS_SEEK_NORMAL),
+        ("unsafe", ffms2.FFMS_SEEK_UNSAFE),
+        ("aggressive", ffms2.FFMS_SEEK_AGGRESSIVE),
+    ]
+)
+
+NATIVE_FORMAT = "native"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        prog="{} -m {}".format(
+            os.path.basename(sys.executable), "ffms2.bench"
+        ),
+    )
+    parser.add_argument(
+        "input_files",
+        metavar="input",
+        nargs="*",
+        default=[DEFAULT_INPUT_FILE],
+        help="media files (default: the bundled sample)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-file",
+        metavar="FILE",
+        default="-",
+        help="JSON results file (default: stdout)",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        metavar="N,...",
+        type=int_list,
+        default=[1, 0],
+        help="decoding thread counts to sweep (0 for auto, default: 1,0)",
+    )
+    parser.add_argument(
+        "-s",
+        "--seek-modes",
+        metavar="MODE,...",
+        type=str_list,
+        default=["normal"],
+        help="seek modes to sweep ({}, default: normal)".format(
+            ", ".join(SEEK_MODES)
+        ),
+    )
+    parser.add_argument(
+        "-f",
+        "--formats",
+        metavar="FORMAT,...",
+        type=str_list,
+        default=[NATIVE_FORMAT, "rgb24"],
+        help="output pixel formats to sweep (default: native,rgb24)",
+    )
+    parser.add_argument(
+        "-n",
+        "--frames",
+        metavar="N",
+        type=int,
+        default=200,
+        help="number of frames decoded sequentially",
+    )
+    parser.add_argument(
+        "-r",
+        "--random-frames",
+        metavar="N",
+        type=int,
+        default=50,
+        help="number of frames decoded at random positions",
+    )
+    parser.add_argument(
+        "--repeat",
+        metavar="N",
+        type=int,
+        default=3,
+        help="number of indexing runs (the fastest one is kept)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed for random positions"
+    )
+    parser.add_argument(
+        "--no-audio", action="store_true", help="skip audio benchmarks"
+    )
+    args = parser.parse_args()
+    for seek_mode in args.seek_modes:
+        if seek_mode not in SEEK_MODES:
+            parser.error("unknown seek mode {!r}".format(seek_mode))
+    if args.repeat < 1:
+        parser.error("number of runs must be positive")
+    return args
+
+
+def int_list(s):
+    return [int(v) for v in s.split(",")]
+
+
+def str_list(s):
+    return [v.strip() for v in s.split(",") if v.strip()]
+
+
+def main():
+    args = parse_args()
+    ffms2.set_log_level(ffms2.AV_LOG_QUIET)
+    results = OrderedDict(
+        [
+            ("ffms_version", ffms2.get_version()),
+            ("python_version", platform.python_version()),
+            ("platform", platform.platform()),
+            ("time", time.strftime("%Y-%m-%dT%H:%M:%S%z")),
+            ("files", [bench_file(path, args) for path in args.input_files]),
+        ]
+    )
+    output = json.dumps(results, indent=2)
+    if args.output_file == "-":
+        print(output)
+    else:
+        with open(args.output_file, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+def bench_file(input_file, args):
+    """Run all benchmarks on a single file.
+    """
+    print("Benchmarking", input_file, file=sys.stderr)
+    result = OrderedDict([("input_file", input_file)])
+    result["size"] = os.path.getsize(input_file)
+    index, result["indexing"] = bench_indexing(input_file, args.repeat)
+
+    try:
+        video_track = index.get_first_indexed_track_of_type(
+            ffms2.FFMS_TYPE_VIDEO
+        )
+    except ffms2.Error:
+        video_track = None
+    result["video"] = []
+    if video_track is not None:
+        for num_threads in args.threads:
+            for seek_mode in args.seek_modes:
+                for pix_fmt in args.formats:
+                    result["video"].append(
+                        bench_video(
+                            input_file,
+                            video_track,
+                            index,
+                            num_threads,
+                            seek_mode,
+                            pix_fmt,
+                            args,
+                        )
+                    )
+
+    result["audio"] = None
+    if not args.no_audio:
+        try:
+            audio_track = index.get_first_indexed_track_of_type(
+                ffms2.FFMS_TYPE_AUDIO
+            )
+        except ffms2.Error:
+            pass
+        else:
+            result["audio"] = bench_audio(input_file, audio_track, index)
+    return result
+
+
+def bench_indexing(input_file, repeat):
+    """Index all tracks, keeping the fastest of a number of runs.
+    """
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        indexer = ffms2.Indexer(input_file)
+        for track in indexer.track_info_list:
+            indexer.track_index_settings(track.num, 1, 0)
+        index = indexer.do_indexing2()
+        elapsed = min(elapsed, time.perf_counter() - start_time)
+    size = os.path.getsize(input_file)
+    return (
+        index,
+        OrderedDict(
+            [
+                ("runs", repeat),
+                ("seconds", elapsed),
+                ("mb_per_second", size / 1e6 / elapsed),
+            ]
+        ),
+    )
+
+
+def bench_video(
+    input_file, track_number, index, num_threads, seek_mode, pix_fmt, args
+):
+    """Measure sequential and random decoding speed for one configuration.
+    """
+    vsource = ffms2.VideoSource(
+        input_file, track_number, index, num_threads, SEEK_MODES[seek_mode]
+    )
+    if pix_fmt != NATIVE_FORMAT:
+        vsource.set_output_format([ffms2.get_pix_fmt(pix_fmt)])
+    num_frames = vsource.properties.NumFrames
+    rng = random.Random(args.seed)
+    result = OrderedDict(
+        [
+            ("num_threads", num_threads),
+            ("seek_mode", seek_mode),
+            ("format", pix_fmt),
+        ]
+    )
+
+    frames = range(min(args.frames, num_frames))
+    latencies = time_calls(vsource.get_frame, frames)
+    result["sequential"] = OrderedDict(
+        [("frames", len(frames)), ("fps", get_rate(latencies))]
+    )
+
+    frames = [rng.randrange(num_frames) for _ in range(args.random_frames)]
+    latencies = time_calls(vsource.get_frame, frames)
+    result["random"] = OrderedDict(
+        [("frames", len(frames)), ("fps", get_rate(latencies))]
+    )
+    result["random"].update(get_latency_stats(latencies))
+
+    first_time = vsource.properties.FirstTime
+    last_time = vsource.properties.LastTime
+    times = [
+        rng.uniform(first_time, last_time) for _ in range(args.random_frames)
+    ]
+    latencies = time_calls(vsource.get_frame_by_time, times)
+    result["by_time"] = OrderedDict([("frames", len(times))])
+    result["by_time"].update(get_latency_stats(latencies))
+    return result
+
+
+def bench_audio(input_file, track_number, index):
+    """Measure linear audio decoding speed.
+    """
+    asource = ffms2.AudioSource(input_file, track_number, index)
+    start_time = time.perf_counter()
+    for _ in asource.linear_access():
+        pass
+    elapsed = time.perf_counter() - start_time
+    num_samples = asource.properties.NumSamples
+    return OrderedDict(
+        [
+            ("samples", num_samples),
+            ("seconds", elapsed),
+            ("samples_per_second", num_samples / elapsed if elapsed else None),
+        ]
+    )
+
+
+def time_calls(func, args):
+    """Call func with each argument and return the latencies in seconds.
+    """
+    latencies = []
+    for arg in args:
+        start_time = time.perf_counter()
+        func(arg)
+        latencies.append(time.perf_counter() - start_time)
+    return latencies
+
+
+def get_rate(latencies):
+    total = sum(latencies)
+    return len(latencies) / total if total else None
+
+
+def get_latency_stats(latencies):
+    if not latencies:
+        return OrderedDict()
+    latencies = sorted(latencies)
+    return OrderedDict(
+        [
+            ("mean_ms", 1000 * sum(latencies) / len(latencies)),
+            ("median_ms", 1000 * latencies[len(latencies) // 2]),
+            ("p95_ms", 1000 * latencies[int(0.95 * (len(latencies) - 1))]),
+            ("max_ms", 1000 * latencies[-1]),
+        ]
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
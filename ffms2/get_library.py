@@ -34,23 +34,66 @@ def get_library(
     win64_format=None,
     win_class_name="CDLL",
     win_attr_format=None,
+    library_path=None,
+    cache_file=None,
 ):
     """Find and load a shared library.
+
+    If library_path isn't given, the path that is found is saved in
+    cache_file, if any, to skip the search next time.
     """
+
+    def load(library_path):
+        return load_library(
+            library_path,
+            mode,
+            handle,
+            use_errno,
+            use_last_error,
+            win_class_name,
+            win_attr_format,
+        )
+
+    if library_path:
+        return load(library_path)
+    cached_path = read_cached_path(cache_file) if cache_file else None
+    # Library names (not paths) are looked up by the loader.
+    if cached_path and (
+        not os.path.isabs(cached_path) or os.path.isfile(cached_path)
+    ):
+        try:
+            return load(cached_path)
+        except OSError:
+            pass
     library_path = get_library_path(name, win_format, win64_format)
     if not library_path:
         if not lib_name:
             lib_name = name
         raise OSError("can’t find {!r} library".format(lib_name))
-    return load_library(
-        library_path,
-        mode,
-        handle,
-        use_errno,
-        use_last_error,
-        win_class_name,
-        win_attr_format,
-    )
+    lib = load(library_path)
+    if cache_file:
+        write_cached_path(cache_file, library_path)
+    return lib
+
+
+def read_cached_path(cache_file):
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def write_cached_path(cache_file, library_path):
+    tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(library_path)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # The cache is only an optimization.
+        pass
 
 
 if os.name == "nt":
@@ -1,17 +1,132 @@
 # Based on file generated by ctypeslib scripts.
 # h2xml ffms.h -o ffms.xml && xml2py ffms.xml -o ffms.py -l libffms2.so
 
+import hashlib
 import os
+import sys
+import threading
 from ctypes import *  # @UnusedWildImport
 
 from .get_library import get_library
 
-lib = get_library(
-    "ffms2",
-    win_format="{}.dll",
-    win64_format=["{}-x64.dll", "{}.dll"],
-    win_class_name="WinDLL",
-)
+# The library is loaded on first use, so that importing is fast.
+LIBRARY_ENV = "FFMS2_LIBRARY"
+_lib = None
+_library_path = None
+_loaded = False
+_init_hooks = []
+_lock = threading.RLock()
+
+
+def set_library_path(library_path):
+    """Set the path of the FFMS2 shared library, before it is loaded.
+
+    Defaults to the FFMS2_LIBRARY environment variable, or the library
+    found on the system (the result of the search is cached).
+    """
+    global _library_path
+    with _lock:
+        if _lib is not None:
+            raise RuntimeError("FFMS2 library already loaded")
+        _library_path = library_path
+
+
+def add_init_hook(func):
+    """Register a function to call once the library is loaded.
+    """
+    _init_hooks.append(func)
+
+
+def get_lib():
+    """Load the FFMS2 shared library on first use.
+    """
+    global _lib, _loaded
+    if not _loaded:
+        with _lock:
+            # Init hooks may call library functions while it's loading.
+            if _lib is None:
+                _lib = get_library(
+                    "ffms2",
+                    win_format="{}.dll",
+                    win64_format=["{}-x64.dll", "{}.dll"],
+                    win_class_name="WinDLL",
+                    library_path=_library_path or os.environ.get(LIBRARY_ENV),
+                    cache_file=_get_cache_file(),
+                )
+                for func in _init_hooks:
+                    func()
+                _loaded = True
+    return _lib
+
+
+def _get_cache_file():
+    if os.name == "nt":
+        cache_dir = os.environ.get("LOCALAPPDATA")
+    else:
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(
+            "~/.cache"
+        )
+    if not cache_dir:
+        return None
+    # Each installation (package directory and Python environment) finds
+    # its own library. Installing system libraries updates ld.so.cache,
+    # which invalidates cached sonames.
+    key = [
+        sys.platform,
+        str(sizeof(c_void_p) * 8),
+        os.path.dirname(os.path.abspath(__file__)),
+        sys.prefix,
+    ]
+    try:
+        key.append(str(os.stat("/etc/ld.so.cache").st_mtime_ns))
+    except OSError:
+        pass
+    return os.path.join(
+        cache_dir,
+        "ffms2",
+        "library-{}.txt".format(
+            hashlib.sha1("\0".join(key).encode()).hexdigest()[:16]
+        ),
+    )
+
+
+class _Function:
+    """Library function, bound on first call
+    """
+
+    def __init__(self, name, restype, argtypes):
+        self.__name__ = name
+        self.restype = restype
+        self.argtypes = argtypes
+        self._func = None
+
+    def __repr__(self):
+        return "<{} {}>".format(self.__class__.__name__, self.__name__)
+
+    def __call__(self, *args):
+        func = self._func
+        if func is None:
+            func = self._bind()
+        return func(*args)
+
+    def _bind(self):
+        func = getattr(get_lib(), self.__name__)
+        func.restype = self.restype
+        func.argtypes = self.argtypes
+        self._func = func
+        return func
+
+    @property
+    def available(self):
+        """Whether the library has this function
+        """
+        if self._func is None:
+            try:
+                self._bind()
+            except AttributeError:
+                return False
+        return True
+
 
 FFMS_VERSION = (2 << 24) | (17 << 16) | (3 << 8) | 0
 FUNCTYPE = WINFUNCTYPE if os.name == "nt" else CFUNCTYPE
@@ -184,220 +299,206 @@ FFMS_AudioProperties._fields_ = [
 
 TIndexCallback = FUNCTYPE(c_int, c_int64, c_int64, c_void_p)
 
-FFMS_Init = lib.FFMS_Init
-FFMS_Init.restype = None
-FFMS_Init.argtypes = [c_int, c_int]
-FFMS_GetVersion = lib.FFMS_GetVersion
-FFMS_GetVersion.restype = c_int
-FFMS_GetVersion.argtypes = []
-FFMS_GetLogLevel = lib.FFMS_GetLogLevel
-FFMS_GetLogLevel.restype = c_int
-FFMS_GetLogLevel.argtypes = []
-FFMS_SetLogLevel = lib.FFMS_SetLogLevel
-FFMS_SetLogLevel.restype = None
-FFMS_SetLogLevel.argtypes = [c_int]
-FFMS_CreateVideoSource = lib.FFMS_CreateVideoSource
-FFMS_CreateVideoSource.restype = POINTER(FFMS_VideoSource)
-FFMS_CreateVideoSource.argtypes = [
-    STRING,
-    c_int,
-    POINTER(FFMS_Index),
-    c_int,
-    c_int,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_CreateAudioSource = lib.FFMS_CreateAudioSource
-FFMS_CreateAudioSource.restype = POINTER(FFMS_AudioSource)
-FFMS_CreateAudioSource.argtypes = [
-    STRING,
-    c_int,
-    POINTER(FFMS_Index),
-    c_int,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_DestroyVideoSource = lib.FFMS_DestroyVideoSource
-FFMS_DestroyVideoSource.restype = None
-FFMS_DestroyVideoSource.argtypes = [POINTER(FFMS_VideoSource)]
-FFMS_DestroyAudioSource = lib.FFMS_DestroyAudioSource
-FFMS_DestroyAudioSource.restype = None
-FFMS_DestroyAudioSource.argtypes = [POINTER(FFMS_AudioSource)]
-FFMS_GetVideoProperties = lib.FFMS_GetVideoProperties
-FFMS_GetVideoProperties.restype = POINTER(FFMS_VideoProperties)
-FFMS_GetVideoProperties.argtypes = [POINTER(FFMS_VideoSource)]
-FFMS_GetAudioProperties = lib.FFMS_GetAudioProperties
-FFMS_GetAudioProperties.restype = POINTER(FFMS_AudioProperties)
-FFMS_GetAudioProperties.argtypes = [POINTER(FFMS_AudioSource)]
-FFMS_GetFrame = lib.FFMS_GetFrame
-FFMS_GetFrame.restype = POINTER(FFMS_Frame)
-FFMS_GetFrame.argtypes = [
+FFMS_Init = _Function("FFMS_Init", None, [c_int, c_int])
+FFMS_GetVersion = _Function("FFMS_GetVersion", c_int, [])
+FFMS_GetLogLevel = _Function("FFMS_GetLogLevel", c_int, [])
+FFMS_SetLogLevel = _Function("FFMS_SetLogLevel", None, [c_int])
+FFMS_CreateVideoSource = _Function(
+    "FFMS_CreateVideoSource",
     POINTER(FFMS_VideoSource),
-    c_int,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_GetFrameByTime = lib.FFMS_GetFrameByTime
-FFMS_GetFrameByTime.restype = POINTER(FFMS_Frame)
-FFMS_GetFrameByTime.argtypes = [
-    POINTER(FFMS_VideoSource),
-    c_double,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_GetAudio = lib.FFMS_GetAudio
-FFMS_GetAudio.restype = c_int
-FFMS_GetAudio.argtypes = [
-    POINTER(FFMS_AudioSource),
-    c_void_p,
-    c_int64,
-    c_int64,
-    POINTER(FFMS_ErrorInfo),
-]
-try:
-    FFMS_SetOutputFormatV2 = lib.FFMS_SetOutputFormatV2
-    FFMS_SetOutputFormatV2.restype = c_int
-    FFMS_SetOutputFormatV2.argtypes = [
-        POINTER(FFMS_VideoSource),
-        POINTER(c_int),
+    [
+        STRING,
         c_int,
+        POINTER(FFMS_Index),
         c_int,
         c_int,
         POINTER(FFMS_ErrorInfo),
-    ]
-except AttributeError:
-    FFMS_SetOutputFormatV2 = None
-    FFMS_SetOutputFormatV = lib.FFMS_SetOutputFormatV
-    FFMS_SetOutputFormatV.restype = c_int
-    FFMS_SetOutputFormatV.argtypes = [
-        POINTER(FFMS_VideoSource),
+    ],
+)
+FFMS_CreateAudioSource = _Function(
+    "FFMS_CreateAudioSource",
+    POINTER(FFMS_AudioSource),
+    [STRING, c_int, POINTER(FFMS_Index), c_int, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_DestroyVideoSource = _Function(
+    "FFMS_DestroyVideoSource", None, [POINTER(FFMS_VideoSource)]
+)
+FFMS_DestroyAudioSource = _Function(
+    "FFMS_DestroyAudioSource", None, [POINTER(FFMS_AudioSource)]
+)
+FFMS_GetVideoProperties = _Function(
+    "FFMS_GetVideoProperties",
+    POINTER(FFMS_VideoProperties),
+    [POINTER(FFMS_VideoSource)],
+)
+FFMS_GetAudioProperties = _Function(
+    "FFMS_GetAudioProperties",
+    POINTER(FFMS_AudioProperties),
+    [POINTER(FFMS_AudioSource)],
+)
+FFMS_GetFrame = _Function(
+    "FFMS_GetFrame",
+    POINTER(FFMS_Frame),
+    [POINTER(FFMS_VideoSource), c_int, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_GetFrameByTime = _Function(
+    "FFMS_GetFrameByTime",
+    POINTER(FFMS_Frame),
+    [POINTER(FFMS_VideoSource), c_double, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_GetAudio = _Function(
+    "FFMS_GetAudio",
+    c_int,
+    [
+        POINTER(FFMS_AudioSource),
+        c_void_p,
         c_int64,
+        c_int64,
+        POINTER(FFMS_ErrorInfo),
+    ],
+)
+FFMS_SetOutputFormatV2 = _Function(
+    "FFMS_SetOutputFormatV2",
+    c_int,
+    [
+        POINTER(FFMS_VideoSource),
+        POINTER(c_int),
         c_int,
         c_int,
         c_int,
         POINTER(FFMS_ErrorInfo),
-    ]
-FFMS_ResetOutputFormatV = lib.FFMS_ResetOutputFormatV
-FFMS_ResetOutputFormatV.restype = None
-FFMS_ResetOutputFormatV.argtypes = [POINTER(FFMS_VideoSource)]
-try:
-    FFMS_SetInputFormatV = lib.FFMS_SetInputFormatV
-    FFMS_SetInputFormatV.restype = c_int
-    FFMS_SetInputFormatV.argtypes = [
+    ],
+)
+FFMS_SetOutputFormatV = _Function(
+    "FFMS_SetOutputFormatV",
+    c_int,
+    [
         POINTER(FFMS_VideoSource),
+        c_int64,
         c_int,
         c_int,
         c_int,
         POINTER(FFMS_ErrorInfo),
-    ]
-    FFMS_ResetInputFormatV = lib.FFMS_ResetInputFormatV
-    FFMS_ResetInputFormatV.restype = None
-    FFMS_ResetInputFormatV.argtypes = [POINTER(FFMS_VideoSource)]
-except AttributeError:
-    FFMS_SetInputFormatV = FFMS_ResetInputFormatV = None
-FFMS_DestroyIndex = lib.FFMS_DestroyIndex
-FFMS_DestroyIndex.restype = None
-FFMS_DestroyIndex.argtypes = [POINTER(FFMS_Index)]
-FFMS_GetFirstTrackOfType = lib.FFMS_GetFirstTrackOfType
-FFMS_GetFirstTrackOfType.restype = c_int
-FFMS_GetFirstTrackOfType.argtypes = [
-    POINTER(FFMS_Index),
+    ],
+)
+FFMS_ResetOutputFormatV = _Function(
+    "FFMS_ResetOutputFormatV", None, [POINTER(FFMS_VideoSource)]
+)
+FFMS_SetInputFormatV = _Function(
+    "FFMS_SetInputFormatV",
     c_int,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_TrackIndexSettings = lib.FFMS_TrackIndexSettings
-FFMS_TrackIndexSettings.restype = None
-FFMS_TrackIndexSettings.argtypes = [POINTER(FFMS_Indexer), c_int, c_int, c_int]
-FFMS_GetFirstIndexedTrackOfType = lib.FFMS_GetFirstIndexedTrackOfType
-FFMS_GetFirstIndexedTrackOfType.restype = c_int
-FFMS_GetFirstIndexedTrackOfType.argtypes = [
-    POINTER(FFMS_Index),
+    [POINTER(FFMS_VideoSource), c_int, c_int, c_int, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_ResetInputFormatV = _Function(
+    "FFMS_ResetInputFormatV", None, [POINTER(FFMS_VideoSource)]
+)
+FFMS_DestroyIndex = _Function("FFMS_DestroyIndex", None, [POINTER(FFMS_Index)])
+FFMS_GetFirstTrackOfType = _Function(
+    "FFMS_GetFirstTrackOfType",
     c_int,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_GetNumTracks = lib.FFMS_GetNumTracks
-FFMS_GetNumTracks.restype = c_int
-FFMS_GetNumTracks.argtypes = [POINTER(FFMS_Index)]
-FFMS_GetNumTracksI = lib.FFMS_GetNumTracksI
-FFMS_GetNumTracksI.restype = c_int
-FFMS_GetNumTracksI.argtypes = [POINTER(FFMS_Indexer)]
-FFMS_GetTrackType = lib.FFMS_GetTrackType
-FFMS_GetTrackType.restype = c_int
-FFMS_GetTrackType.argtypes = [POINTER(FFMS_Track)]
-FFMS_GetTrackTypeI = lib.FFMS_GetTrackTypeI
-FFMS_GetTrackTypeI.restype = c_int
-FFMS_GetTrackTypeI.argtypes = [POINTER(FFMS_Indexer), c_int]
-FFMS_GetCodecNameI = lib.FFMS_GetCodecNameI
-FFMS_GetCodecNameI.restype = STRING
-FFMS_GetCodecNameI.argtypes = [POINTER(FFMS_Indexer), c_int]
-FFMS_GetFormatNameI = lib.FFMS_GetFormatNameI
-FFMS_GetFormatNameI.restype = STRING
-FFMS_GetFormatNameI.argtypes = [POINTER(FFMS_Indexer)]
-FFMS_GetNumFrames = lib.FFMS_GetNumFrames
-FFMS_GetNumFrames.restype = c_int
-FFMS_GetNumFrames.argtypes = [POINTER(FFMS_Track)]
-FFMS_GetFrameInfo = lib.FFMS_GetFrameInfo
-FFMS_GetFrameInfo.restype = POINTER(FFMS_FrameInfo)
-FFMS_GetFrameInfo.argtypes = [POINTER(FFMS_Track), c_int]
-FFMS_GetTrackFromIndex = lib.FFMS_GetTrackFromIndex
-FFMS_GetTrackFromIndex.restype = POINTER(FFMS_Track)
-FFMS_GetTrackFromIndex.argtypes = [POINTER(FFMS_Index), c_int]
-FFMS_GetTrackFromVideo = lib.FFMS_GetTrackFromVideo
-FFMS_GetTrackFromVideo.restype = POINTER(FFMS_Track)
-FFMS_GetTrackFromVideo.argtypes = [POINTER(FFMS_VideoSource)]
-FFMS_GetTrackFromAudio = lib.FFMS_GetTrackFromAudio
-FFMS_GetTrackFromAudio.restype = POINTER(FFMS_Track)
-FFMS_GetTrackFromAudio.argtypes = [POINTER(FFMS_AudioSource)]
-FFMS_GetTimeBase = lib.FFMS_GetTimeBase
-FFMS_GetTimeBase.restype = POINTER(FFMS_TrackTimeBase)
-FFMS_GetTimeBase.argtypes = [POINTER(FFMS_Track)]
-FFMS_WriteTimecodes = lib.FFMS_WriteTimecodes
-FFMS_WriteTimecodes.restype = c_int
-FFMS_WriteTimecodes.argtypes = [
-    POINTER(FFMS_Track),
-    STRING,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_SetProgressCallback = lib.FFMS_SetProgressCallback
-FFMS_SetProgressCallback.restype = c_int
-FFMS_SetProgressCallback.argtypes = [
-    POINTER(FFMS_Indexer),
-    TIndexCallback,
-    c_void_p,
-]
-FFMS_CreateIndexer = lib.FFMS_CreateIndexer
-FFMS_CreateIndexer.restype = POINTER(FFMS_Indexer)
-FFMS_CreateIndexer.argtypes = [STRING, POINTER(FFMS_ErrorInfo)]
-FFMS_DoIndexing2 = lib.FFMS_DoIndexing2
-FFMS_DoIndexing2.restype = POINTER(FFMS_Index)
-FFMS_DoIndexing2.argtypes = [
-    POINTER(FFMS_Indexer),
+    [POINTER(FFMS_Index), c_int, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_TrackIndexSettings = _Function(
+    "FFMS_TrackIndexSettings",
+    None,
+    [POINTER(FFMS_Indexer), c_int, c_int, c_int],
+)
+FFMS_GetFirstIndexedTrackOfType = _Function(
+    "FFMS_GetFirstIndexedTrackOfType",
     c_int,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_CancelIndexing = lib.FFMS_CancelIndexing
-FFMS_CancelIndexing.restype = None
-FFMS_CancelIndexing.argtypes = [POINTER(FFMS_Indexer)]
-FFMS_ReadIndex = lib.FFMS_ReadIndex
-FFMS_ReadIndex.restype = POINTER(FFMS_Index)
-FFMS_ReadIndex.argtypes = [STRING, POINTER(FFMS_ErrorInfo)]
-FFMS_IndexBelongsToFile = lib.FFMS_IndexBelongsToFile
-FFMS_IndexBelongsToFile.restype = c_int
-FFMS_IndexBelongsToFile.argtypes = [
+    [POINTER(FFMS_Index), c_int, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_GetNumTracks = _Function(
+    "FFMS_GetNumTracks", c_int, [POINTER(FFMS_Index)]
+)
+FFMS_GetNumTracksI = _Function(
+    "FFMS_GetNumTracksI", c_int, [POINTER(FFMS_Indexer)]
+)
+FFMS_GetTrackType = _Function(
+    "FFMS_GetTrackType", c_int, [POINTER(FFMS_Track)]
+)
+FFMS_GetTrackTypeI = _Function(
+    "FFMS_GetTrackTypeI", c_int, [POINTER(FFMS_Indexer), c_int]
+)
+FFMS_GetCodecNameI = _Function(
+    "FFMS_GetCodecNameI", STRING, [POINTER(FFMS_Indexer), c_int]
+)
+FFMS_GetFormatNameI = _Function(
+    "FFMS_GetFormatNameI", STRING, [POINTER(FFMS_Indexer)]
+)
+FFMS_GetNumFrames = _Function(
+    "FFMS_GetNumFrames", c_int, [POINTER(FFMS_Track)]
+)
+FFMS_GetFrameInfo = _Function(
+    "FFMS_GetFrameInfo", POINTER(FFMS_FrameInfo), [POINTER(FFMS_Track), c_int]
+)
+FFMS_GetTrackFromIndex = _Function(
+    "FFMS_GetTrackFromIndex", POINTER(FFMS_Track), [POINTER(FFMS_Index), c_int]
+)
+FFMS_GetTrackFromVideo = _Function(
+    "FFMS_GetTrackFromVideo", POINTER(FFMS_Track), [POINTER(FFMS_VideoSource)]
+)
+FFMS_GetTrackFromAudio = _Function(
+    "FFMS_GetTrackFromAudio", POINTER(FFMS_Track), [POINTER(FFMS_AudioSource)]
+)
+FFMS_GetTimeBase = _Function(
+    "FFMS_GetTimeBase", POINTER(FFMS_TrackTimeBase), [POINTER(FFMS_Track)]
+)
+FFMS_WriteTimecodes = _Function(
+    "FFMS_WriteTimecodes",
+    c_int,
+    [POINTER(FFMS_Track), STRING, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_SetProgressCallback = _Function(
+    "FFMS_SetProgressCallback",
+    c_int,
+    [POINTER(FFMS_Indexer), TIndexCallback, c_void_p],
+)
+FFMS_CreateIndexer = _Function(
+    "FFMS_CreateIndexer",
+    POINTER(FFMS_Indexer),
+    [STRING, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_DoIndexing2 = _Function(
+    "FFMS_DoIndexing2",
     POINTER(FFMS_Index),
-    STRING,
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_WriteIndex = lib.FFMS_WriteIndex
-FFMS_WriteIndex.restype = c_int
-FFMS_WriteIndex.argtypes = [
-    STRING,
+    [POINTER(FFMS_Indexer), c_int, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_CancelIndexing = _Function(
+    "FFMS_CancelIndexing", None, [POINTER(FFMS_Indexer)]
+)
+FFMS_ReadIndex = _Function(
+    "FFMS_ReadIndex", POINTER(FFMS_Index), [STRING, POINTER(FFMS_ErrorInfo)]
+)
+FFMS_IndexBelongsToFile = _Function(
+    "FFMS_IndexBelongsToFile",
+    c_int,
+    [POINTER(FFMS_Index), STRING, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_WriteIndex = _Function(
+    "FFMS_WriteIndex",
+    c_int,
+    [STRING, POINTER(FFMS_Index), POINTER(FFMS_ErrorInfo)],
+)
+FFMS_WriteIndexToBuffer = _Function(
+    "FFMS_WriteIndexToBuffer",
+    c_int,
+    [
+        POINTER(POINTER(uint8_t)),
+        POINTER(c_size_t),
+        POINTER(FFMS_Index),
+        POINTER(FFMS_ErrorInfo),
+    ],
+)
+FFMS_FreeIndexBuffer = _Function(
+    "FFMS_FreeIndexBuffer", None, [POINTER(POINTER(uint8_t))]
+)
+FFMS_ReadIndexFromBuffer = _Function(
+    "FFMS_ReadIndexFromBuffer",
     POINTER(FFMS_Index),
-    POINTER(FFMS_ErrorInfo),
-]
-FFMS_GetPixFmt = lib.FFMS_GetPixFmt
-FFMS_GetPixFmt.restype = c_int
-FFMS_GetPixFmt.argtypes = [STRING]
-
-try:
-    FFMS_GetErrorHandling = lib.FFMS_GetErrorHandling
-    FFMS_GetErrorHandling.restype = c_int
-    FFMS_GetErrorHandling.argtypes = [POINTER(FFMS_Index)]
-except AttributeError:
-    FFMS_GetErrorHandling = None
+    [STRING, c_size_t, POINTER(FFMS_ErrorInfo)],
+)
+FFMS_GetPixFmt = _Function("FFMS_GetPixFmt", c_int, [STRING])
+FFMS_GetErrorHandling = _Function(
+    "FFMS_GetErrorHandling", c_int, [POINTER(FFMS_Index)]
+)
@@ -0,0 +1,123 @@
+"""Performance counters
+"""
+
+import bisect
+import threading
+from collections import OrderedDict
+
+__all__ = ["LATENCY_BUCKETS", "Stats", "format_prometheus"]
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+
+class Stats:
+    """Call latency histograms and event counters
+
+    Observations are also added to the parent statistics, if any.
+    """
+
+    def __init__(self, calls, counters, parent=None):
+        self.calls = tuple(calls)
+        self.counters = tuple(counters)
+        self.parent = parent
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all counts to zero.
+        """
+        with self._lock:
+            self._buckets = {
+                call: [0] * (len(LATENCY_BUCKETS) + 1) for call in self.calls
+            }
+            self._sums = dict.fromkeys(self.calls, 0.0)
+            self._counts = dict.fromkeys(self.counters, 0)
+
+    def observe(self, call, seconds):
+        """Record the latency of a call.
+        """
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self._buckets[call][bucket] += 1
+            self._sums[call] += seconds
+        if self.parent is not None:
+            self.parent.observe(call, seconds)
+
+    def count(self, counter, n=1):
+        """Increment an event counter.
+        """
+        with self._lock:
+            self._counts[counter] += n
+        if self.parent is not None:
+            self.parent.count(counter, n)
+
+    def snapshot(self):
+        """Return the current statistics as a dictionary.
+
+        Each call has its count, total time in seconds and cumulative
+        histogram buckets (upper bound in seconds to count).
+        """
+        with self._lock:
+            result = OrderedDict()
+            for call in self.calls:
+                buckets = OrderedDict()
+                total = 0
+                for bound, n in zip(
+                    LATENCY_BUCKETS + (float("inf"),), self._buckets[call]
+                ):
+                    total += n
+                    buckets[bound] = total
+                result[call] = OrderedDict(
+                    [
+                        ("count", total),
+                        ("sum", self._sums[call]),
+                        ("buckets", buckets),
+                    ]
+                )
+            result.update(self._counts)
+            return result
+
+
+def format_prometheus(stats, prefix="ffms2"):
+    """Format a statistics snapshot in the Prometheus text format.
+    """
+    lines = []
+    name = "{}_call_duration_seconds".format(prefix)
+    calls = [(call, v) for call, v in stats.items() if isinstance(v, dict)]
+    if calls:
+        lines.append("# HELP {} Latency of FFMS calls.".format(name))
+        lines.append("# TYPE {} histogram".format(name))
+    for call, histogram in calls:
+        for bound, n in histogram["buckets"].items():
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(
+                '{}_bucket{{call="{}",le="{}"}} {}'.format(name, call, le, n)
+            )
+        lines.append(
+            '{}_sum{{call="{}"}} {!r}'.format(name, call, histogram["sum"])
+        )
+        lines.append(
+            '{}_count{{call="{}"}} {}'.format(name, call, histogram["count"])
+        )
+    for counter, n in stats.items():
+        if isinstance(n, dict):
+            continue
+        name = "{}_{}_total".format(prefix, counter)
+        lines.append("# TYPE {} counter".format(name))
+        lines.append("{} {}".format(name, n))
+    return "\n".join(lines) + "\n"
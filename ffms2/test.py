@@ -1,19 +1,34 @@
 #!/usr/bin/env python3
 """Test suite for ffms2."""
 
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy
+
 import ffms2
 
 ROOT_DIR = Path(__file__).parent
+SAMPLE_PATH = ROOT_DIR / "data/morning rescue.mkv"
 
 
 class TestFFMS2(unittest.TestCase):
-    def test_sample_video(self):
-        source_path = Path(ROOT_DIR / "data/morning rescue.mkv")
+    @classmethod
+    def setUpClass(cls):
+        # Shared by the tests that don't exercise indexing itself.
+        cls.index = ffms2.Index.make(str(SAMPLE_PATH))
 
-        indexer = ffms2.Indexer(source_path)
+    def test_sample_video(self):
+        indexer = ffms2.Indexer(SAMPLE_PATH)
         self.assertEqual(indexer.format_name, "matroska,webm")
 
         track_info_list = list(indexer.track_info_list)
@@ -29,7 +44,7 @@ class TestFFMS2(unittest.TestCase):
         self.assertEqual(tracks[0].type, ffms2.FFMS_TYPE_VIDEO)
         self.assertEqual(tracks[1].type, ffms2.FFMS_TYPE_AUDIO)
 
-        video_source = ffms2.VideoSource(source_path, 0, index)
+        video_source = ffms2.VideoSource(SAMPLE_PATH, 0, index)
         self.assertEqual(video_source.properties.ColorRange, 1)
         self.assertEqual(video_source.properties.ColorSpace, 2)
         self.assertEqual(video_source.properties.CropBottom, 0)
@@ -47,7 +62,7 @@ class TestFFMS2(unittest.TestCase):
         self.assertEqual(video_source.properties.SARDen, 1)
         self.assertEqual(video_source.properties.TopFieldFirst, 0)
 
-        audio_source = ffms2.AudioSource(source_path, 1, index)
+        audio_source = ffms2.AudioSource(SAMPLE_PATH, 1, index)
         self.assertEqual(audio_source.properties.BitsPerSample, 32)
         self.assertEqual(audio_source.properties.ChannelLayout, 3)
         self.assertEqual(audio_source.properties.Channels, 2)
@@ -57,6 +72,643 @@ class TestFFMS2(unittest.TestCase):
         self.assertEqual(audio_source.properties.SampleFormat, 3)
         self.assertEqual(audio_source.properties.SampleRate, 44100)
 
+    def test_lazy_import(self):
+        code = (
+            "import sys, ffms2; "
+            "print(sorted({'numpy', 'asyncio'} & set(sys.modules)))"
+        )
+        output = subprocess.check_output(
+            [sys.executable, "-c", code],
+            cwd=str(ROOT_DIR.parent),
+            universal_newlines=True,
+        )
+        self.assertEqual(output.strip(), "[]")
+
+    def test_frame_arrays(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        frame = video_source.get_frame(0)
+        width, height = frame.EncodedWidth, frame.EncodedHeight
+
+        luma, cb, cr = frame.arrays()
+        self.assertEqual(luma.shape, (height, width))
+        self.assertEqual(cb.shape, ((height + 1) // 2, (width + 1) // 2))
+        self.assertEqual(cr.shape, cb.shape)
+        self.assertEqual(luma.strides[0], frame.Linesize[0])
+        self.assertTrue(
+            numpy.array_equal(
+                luma, frame.planes[0].reshape(height, -1)[:, :width]
+            )
+        )
+
+        video_source.set_output_format(
+            [ffms2.get_pix_fmt("rgb24")], width // 2, height // 2
+        )
+        (rgb,) = video_source.get_frame(0).arrays()
+        self.assertEqual(rgb.shape, (height // 2, width // 2, 3))
+
+    def test_get_frame_into(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        video_source.set_output_format([ffms2.get_pix_fmt("gray")])
+
+        ring = video_source.new_frame_buffer(4)
+        for n in range(10):
+            out = video_source.get_frame_into(n, ring, n % len(ring))
+            self.assertTrue(
+                numpy.array_equal(out, video_source.get_frame(n).arrays()[0])
+            )
+        self.assertTrue(numpy.array_equal(ring[1], out))
+
+    def test_get_frames(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+
+        indices = [300, 5, 120, 5, 0, 358]
+        luma, cb, cr = video_source.get_frames(indices)
+        self.assertEqual(len(luma), len(indices))
+        for n, plane in zip(indices, luma):
+            expected = video_source.get_frame(n).arrays()[0]
+            self.assertTrue(numpy.array_equal(plane, expected))
+
+    def test_frame_info_array(self):
+        index = self.index
+        track = index.tracks[0]
+
+        frame_info_array = track.frame_info_array
+        self.assertEqual(len(frame_info_array), 359)
+        self.assertFalse(frame_info_array.flags.writeable)
+        for row, frame_info in zip(frame_info_array, track.frame_info_list):
+            self.assertEqual(row["PTS"], frame_info.PTS)
+            self.assertEqual(row["RepeatPict"], frame_info.RepeatPict)
+            self.assertEqual(row["KeyFrame"], frame_info.KeyFrame)
+        self.assertEqual(track.keyframes[0], 0)
+        self.assertIs(track.keyframes, track.keyframes)
+        self.assertEqual(
+            track.keyframes_as_timecodes.tolist(),
+            [track.timecodes[n] for n in track.keyframes],
+        )
+        self.assertEqual(
+            [float(t) for t in track.exact_timecodes],
+            track.timecodes.tolist(),
+        )
+
+    def test_time_mapping(self):
+        index = self.index
+        track = index.tracks[0]
+        timecodes = track.timecodes
+
+        frames = numpy.arange(len(timecodes))
+        self.assertTrue(
+            numpy.array_equal(track.frame_at_time(timecodes), frames)
+        )
+        self.assertEqual(track.frame_at_time(timecodes[10] + 1), 10)
+        self.assertEqual(track.frame_at_time(-1000), 0)
+        self.assertEqual(track.time_of_frame(10), timecodes[10])
+        self.assertEqual(
+            track.snap_to_frame_boundary(timecodes[10] + 1, "forward"),
+            timecodes[11],
+        )
+        self.assertEqual(
+            track.snap_to_keyframe(timecodes[1], "backward"), timecodes[0]
+        )
+        self.assertIn(
+            track.snap_to_keyframe(timecodes[-1], "nearest"),
+            track.keyframes_as_timecodes,
+        )
+        with self.assertRaises(ValueError):
+            track.snap_to_keyframe(0, "sideways")
+
+    def test_frame_cache(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        self.assertIsNone(video_source.frame_cache_info())
+
+        video_source.enable_frame_cache()
+        first = video_source.get_frames([5, 6])
+        info = video_source.frame_cache_info()
+        self.assertEqual((info.hits, info.misses, info.count), (0, 2, 2))
+        second = video_source.get_frames([6, 5])
+        info = video_source.frame_cache_info()
+        self.assertEqual((info.hits, info.misses, info.count), (2, 2, 2))
+        for plane, other in zip(first, second):
+            self.assertTrue(numpy.array_equal(plane[::-1], other))
+
+        video_source.enable_frame_cache(info.size // 2)
+        info = video_source.frame_cache_info()
+        self.assertEqual((info.count, info.evictions), (1, 1))
+
+    def test_iter_frames(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        gray = [ffms2.get_pix_fmt("gray")]
+
+        frames = list(video_source.iter_frames(0, 100, 3, target_formats=gray))
+        self.assertIsNone(video_source._output_format)
+        video_source.set_output_format(gray)
+        expected = video_source.get_frames(range(0, 100, 3))
+        self.assertEqual(len(frames), len(expected))
+        for frame, expected_frame in zip(frames, expected):
+            self.assertTrue(numpy.array_equal(frame, expected_frame))
+
+        frames = video_source.iter_frames(depth=2)
+        next(frames)
+        frames.close()
+
+    def test_sample_frames(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        keyframes = set(video_source.track.keyframes.tolist())
+
+        frames, arrays = video_source.sample_frames(
+            8, target_formats=[ffms2.get_pix_fmt("gray")], width=64, height=36
+        )
+        self.assertEqual(len(frames), 8)
+        self.assertEqual(len(set(frames.tolist())), 8)
+        self.assertTrue(numpy.all(numpy.diff(frames) > 0))
+        self.assertEqual(arrays.shape, (8, 36, 64))
+        self.assertIsNone(video_source._output_format)
+
+        frames, _ = video_source.sample_frames(8, tolerance=0)
+        self.assertEqual(
+            frames.tolist(), [int((i + 0.5) * 359 / 8) for i in range(8)]
+        )
+        frames, _ = video_source.sample_frames(4, tolerance=359)
+        self.assertTrue(set(frames.tolist()) <= keyframes)
+
+    def test_export(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        frames = range(0, 100, 7)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            npy_path = str(Path(tmp_dir) / "frames.npy")
+            exported = video_source.export(
+                npy_path,
+                frames,
+                target_formats=[ffms2.get_pix_fmt("gray")],
+                flush_size=1,
+            )
+            with video_source.output_format([ffms2.get_pix_fmt("gray")]):
+                expected = video_source.get_frames(frames)
+            self.assertTrue(numpy.array_equal(exported, expected))
+            self.assertTrue(numpy.array_equal(numpy.load(npy_path), expected))
+
+            raw_path = str(Path(tmp_dir) / "frames.yuv")
+            exported = video_source.export(raw_path, frames, format="raw")
+            y, u, v = video_source.get_frames(frames)
+            self.assertTrue(numpy.array_equal(exported["plane0"], y))
+            self.assertTrue(numpy.array_equal(exported["plane2"], v))
+            self.assertEqual(
+                Path(raw_path).stat().st_size, y.nbytes + u.nbytes + v.nbytes
+            )
+            del exported
+
+    def test_iter_frames_parallel(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        video_source.set_output_format([ffms2.get_pix_fmt("gray")])
+
+        expected = video_source.get_frames(range(10, 150))
+        for max_segment in [256, 16]:
+            frames = list(
+                video_source.iter_frames_parallel(
+                    10, 150, workers=2, min_segment=8, max_segment=max_segment
+                )
+            )
+            self.assertEqual(len(frames), len(expected))
+            for frame, expected_frame in zip(frames, expected):
+                self.assertTrue(numpy.array_equal(frame, expected_frame))
+        with self.assertRaises(ValueError):
+            list(
+                video_source.iter_frames_parallel(
+                    min_segment=64, max_segment=32
+                )
+            )
+
+    def test_index_bytes(self):
+        index = self.index
+        data = index.to_bytes()
+        self.assertIsInstance(data, bytes)
+
+        loaded = ffms2.Index.from_bytes(data, str(SAMPLE_PATH))
+        self.assertTrue(
+            numpy.array_equal(
+                loaded.tracks[0].frame_info_array,
+                index.tracks[0].frame_info_array,
+            )
+        )
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, loaded)
+        self.assertEqual(video_source.properties.NumFrames, 359)
+        with self.assertRaises(ffms2.Error):
+            ffms2.Index.from_bytes(data[:10])
+        with self.assertRaises(ffms2.Error):
+            ffms2.Index.from_bytes(data, __file__)
+
+    def test_close(self):
+        indexer = ffms2.Indexer(str(SAMPLE_PATH))
+        indexer.close()
+        self.assertTrue(indexer.closed)
+        with self.assertRaises(ValueError):
+            indexer.do_indexing2()
+        indexer.close()
+
+        with ffms2.Index.make(str(SAMPLE_PATH)) as index:
+            track = index.tracks[0]
+            with ffms2.VideoSource(str(SAMPLE_PATH), 0, index) as source:
+                source.get_frame(0)
+                source_track = source.track
+            self.assertTrue(source.closed)
+            with self.assertRaises(ValueError):
+                source.get_frame(0)
+            self.assertFalse(index.closed)
+            # Tracks are freed with their source or index.
+            with self.assertRaises(ValueError):
+                source_track.keyframes
+            # Closing twice is harmless.
+            source.close()
+        with self.assertRaises(ValueError):
+            index.tracks
+        with self.assertRaises(ValueError):
+            track.keyframes
+
+        # Sources close the indexes they create.
+        with ffms2.VideoSource(str(SAMPLE_PATH)) as source:
+            index = source.index
+        self.assertTrue(index.closed)
+
+        index = ffms2.Index.make(str(SAMPLE_PATH))
+        source = ffms2.VideoSource(str(SAMPLE_PATH), 0, index)
+        index.close()
+        source.get_frame(0)
+        with self.assertRaises(ValueError):
+            pickle.dumps(source)
+
+    def test_pickle(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        video_source.set_output_format([ffms2.get_pix_fmt("gray")])
+        expected = video_source.get_frames([0, 100])
+        loaded = pickle.loads(pickle.dumps(video_source))
+        # The native handles are only opened on first use.
+        self.assertIsNone(loaded._handle)
+        self.assertIsNone(loaded.index._handle)
+        self.assertTrue(
+            numpy.array_equal(loaded.get_frames([0, 100]), expected)
+        )
+
+        audio_source = ffms2.AudioSource(str(SAMPLE_PATH), 1, self.index)
+        audio = audio_source.get_audio(0, 1000)
+        loaded = pickle.loads(pickle.dumps(audio_source))
+        self.assertTrue(numpy.array_equal(loaded.get_audio(0, 1000), audio))
+
+    def test_index_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            ffms2.set_index_cache(cache_dir, max_size=1 << 30)
+            try:
+                ffms2.VideoSource(str(SAMPLE_PATH))
+                cache = ffms2.get_index_cache()
+                index_file = cache.get_index_file(SAMPLE_PATH)
+                self.assertTrue(Path(index_file).is_file())
+                self.assertEqual(len(list(Path(cache_dir).iterdir())), 1)
+
+                index = cache.get(SAMPLE_PATH)
+                self.assertIsNotNone(index)
+                self.assertIsNone(index.index_file)
+                audio_source = ffms2.AudioSource(str(SAMPLE_PATH))
+                self.assertEqual(audio_source.properties.SampleRate, 44100)
+                index = cache.get(SAMPLE_PATH)
+                self.assertTrue(len(index.tracks[0].frame_info_array))
+                self.assertTrue(len(index.tracks[1].frame_info_array))
+
+                cache.max_size = 0
+                cache.prune()
+                self.assertIsNone(cache.get(SAMPLE_PATH))
+            finally:
+                ffms2.set_index_cache(None)
+
+    def test_index_cache_env(self):
+        code = (
+            "import ffms2; cache = ffms2.get_index_cache(); "
+            "print(cache.cache_dir, cache.max_size, cache.max_age)"
+        )
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = dict(os.environ, FFMS2_INDEX_CACHE=cache_dir)
+            env.pop("FFMS2_INDEX_CACHE_MAX_SIZE", None)
+            env["FFMS2_INDEX_CACHE_MAX_AGE"] = "86400"
+            output = subprocess.check_output(
+                [sys.executable, "-c", code],
+                cwd=str(ROOT_DIR.parent),
+                env=env,
+                universal_newlines=True,
+            )
+            self.assertEqual(
+                output.split(), [cache_dir, str(1 << 30), "86400.0"]
+            )
+
+    def test_audio_buffers(self):
+        audio_source = ffms2.AudioSource(str(SAMPLE_PATH), index=self.index)
+        channels = audio_source.properties.Channels
+
+        audio = audio_source.get_audio(1000, 4410)
+        self.assertEqual(audio.shape, (4410, channels))
+        out = numpy.empty((8820, channels), audio_source.sample_type)
+        self.assertIs(audio_source.get_audio(1000, out=out), out)
+        self.assertTrue(numpy.array_equal(out[:4410], audio))
+        with self.assertRaises(ValueError):
+            audio_source.get_audio(0, out=out[:, :1])
+
+        chunks = [
+            chunk.copy()
+            for chunk in audio_source.linear_access(0, 44100, rate=100)
+        ]
+        ring = numpy.empty((2000, channels), audio_source.sample_type)
+        for chunk, expected in zip(
+            audio_source.linear_access(0, 44100, rate=100, out=ring), chunks
+        ):
+            self.assertTrue(numpy.shares_memory(chunk, ring))
+            self.assertTrue(numpy.array_equal(chunk, expected))
+
+        whole = numpy.empty((44100, channels), audio_source.sample_type)
+        for _ in audio_source.linear_access(0, 44100, rate=100, out=whole):
+            pass
+        self.assertTrue(numpy.array_equal(whole, numpy.concatenate(chunks)))
+
+    def test_compute_peaks(self):
+        audio_source = ffms2.AudioSource(str(SAMPLE_PATH), index=self.index)
+        num_samples = audio_source.properties.NumSamples
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            peaks_file = str(Path(tmp_dir) / "peaks.npy")
+            peaks = audio_source.compute_peaks(1024, peaks_file=peaks_file)
+            self.assertEqual(peaks.block_sizes[:2], [1024, 4096])
+            self.assertEqual(len(peaks.levels[0]), -(-num_samples // 1024))
+            self.assertEqual(len(peaks.levels[-1]), 1)
+
+            audio = audio_source.get_audio(0, num_samples)
+            top = peaks.levels[-1][0]
+            self.assertTrue(numpy.array_equal(top["min"], audio.min(0)))
+            self.assertTrue(numpy.array_equal(top["max"], audio.max(0)))
+            block = audio[1024:2048].astype(numpy.float64)
+            self.assertTrue(
+                numpy.allclose(
+                    peaks.levels[0][1]["rms"],
+                    numpy.sqrt(numpy.square(block).mean(0)),
+                    rtol=1e-4,
+                )
+            )
+
+            reloaded = audio_source.compute_peaks(1024, peaks_file=peaks_file)
+            self.assertIsInstance(reloaded.peaks, numpy.memmap)
+            self.assertIs(peaks.get_level(5000), peaks.levels[1])
+
+    def test_cancel_indexing(self):
+        indexer = ffms2.Indexer(str(SAMPLE_PATH))
+        progress = indexer.progress_queue()
+        indexer.cancel()
+        with self.assertRaises(ffms2.Error):
+            indexer.do_indexing2()
+        self.assertLessEqual(len(list(iter(progress.get_nowait, None))), 1)
+
+        indexer = ffms2.Indexer(str(SAMPLE_PATH))
+        with self.assertRaises(ffms2.Error) as cm:
+            indexer.do_indexing2(timeout=0)
+        self.assertEqual(cm.exception.error_type, ffms2.FFMS_ERROR_CANCELLED)
+        self.assertIn("timed out", str(cm.exception))
+
+        indexer = ffms2.Indexer(str(SAMPLE_PATH))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            events = executor.submit(list, indexer.iter_progress())
+            indexer.do_indexing2()
+            events = events.result()
+        self.assertTrue(events)
+        self.assertLessEqual(events[-1].percent, 100)
+        self.assertEqual(events[-1].total, events[0].total)
+
+        # The end of the run gets through a full queue.
+        indexer = ffms2.Indexer(str(SAMPLE_PATH))
+        progress = indexer.progress_queue(maxsize=2)
+        indexer.do_indexing2()
+        self.assertLessEqual(len(list(iter(progress.get_nowait, None))), 2)
+
+    def test_async(self):
+        async def run():
+            indexer = ffms2.Indexer(str(SAMPLE_PATH))
+            progress = indexer.progress_async()
+            index, steps = await asyncio.gather(
+                indexer.do_indexing2_async(), collect(progress)
+            )
+            self.assertTrue(steps)
+            self.assertTrue(all(step.current <= step.total for step in steps))
+
+            video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, index)
+            video_source.set_output_format([ffms2.get_pix_fmt("gray")])
+            frames = await asyncio.gather(
+                *[video_source.get_frame_async(n) for n in range(0, 60, 10)]
+            )
+            expected = video_source.get_frames(range(0, 60, 10))
+            for frame, expected_frame in zip(frames, expected):
+                self.assertTrue(numpy.array_equal(frame, expected_frame))
+
+            index = await ffms2.Index.make_async(str(SAMPLE_PATH))
+            audio_source = ffms2.AudioSource(str(SAMPLE_PATH), 1, index)
+            audio = await audio_source.get_audio_async(0, 100)
+            self.assertEqual(audio.shape, (100, 2))
+
+            # Decoding a source doesn't hold up calls on other sources.
+            with ThreadPoolExecutor(1) as executor:
+                ffms2.set_executor(executor)
+                try:
+                    frames = asyncio.gather(
+                        *[video_source.get_frame_async(n) for n in range(30)]
+                    )
+                    audio = await audio_source.get_audio_async(0, 100)
+                    self.assertFalse(frames.done())
+                    await frames
+                finally:
+                    ffms2.set_executor(None)
+            await video_source.close_async()
+            self.assertTrue(video_source.closed)
+
+        async def collect(progress):
+            return [step async for step in progress]
+
+        asyncio.run(run())
+
+        # Progress streams don't need a running event loop until iterated.
+        indexer = ffms2.Indexer(str(SAMPLE_PATH))
+        progress = indexer.progress_async()
+        indexer.do_indexing2()
+        self.assertTrue(asyncio.run(collect(progress)))
+
+    def test_video_source_pool(self):
+        pool = ffms2.VideoSourcePool(
+            str(SAMPLE_PATH), 2, target_formats=[ffms2.get_pix_fmt("gray")]
+        )
+        keyframes = pool.index.tracks[pool.track_number].keyframes
+        a, b = keyframes[0], keyframes[-1]
+
+        with pool.acquire(a) as source_a:
+            source_a.get_frame(a)
+        with pool.acquire(b) as source_b:
+            source_b.get_frame(b)
+        self.assertIsNot(source_a, source_b)
+        self.assertEqual(len(pool), 2)
+        with pool.acquire(a + 1) as source:
+            self.assertIs(source, source_a)
+        with pool.acquire(b + 1) as source:
+            self.assertIs(source, source_b)
+
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        video_source.set_output_format([ffms2.get_pix_fmt("gray")])
+        frames = [0, 200, 1, 201, 2, 202]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(pool.get_frame_copy, frames))
+        for n, frame in zip(frames, results):
+            self.assertTrue(
+                numpy.array_equal(frame, video_source.get_frames([n])[0])
+            )
+
+    def test_stats(self):
+        video_source = ffms2.VideoSource(str(SAMPLE_PATH), 0, self.index)
+        before = ffms2.get_stats()
+        for n in [0, 1, 2, 100, 101, 50]:
+            video_source.get_frame(n)
+        # Probing the frame format isn't counted.
+        video_source.set_output_format([ffms2.get_pix_fmt("gray")])
+        video_source.reset_output_format()
+        video_source.get_frame_by_time(1.0)
+
+        stats = video_source.stats()
+        self.assertEqual(stats["get_frame"]["count"], 6)
+        self.assertEqual(stats["get_frame"]["buckets"][float("inf")], 6)
+        self.assertGreater(stats["get_frame"]["sum"], 0)
+        self.assertEqual(stats["get_frame_by_time"]["count"], 1)
+        self.assertEqual(stats["seeks"], 2)
+        self.assertEqual(stats["format_switches"], 2)
+        self.assertNotIn("get_audio", stats)
+
+        after = ffms2.get_stats()
+        self.assertEqual(
+            after["get_frame"]["count"] - before["get_frame"]["count"], 6
+        )
+        text = ffms2.format_stats_prometheus()
+        self.assertIn(
+            'ffms2_call_duration_seconds_count{call="get_frame"}', text
+        )
+        self.assertIn("ffms2_seeks_total", text)
+
+        audio_source = ffms2.AudioSource(str(SAMPLE_PATH), index=self.index)
+        audio_source.get_audio(0, 100)
+        audio_source.get_audio(100, 100)
+        audio_source.get_audio(1000, 100)
+        stats = audio_source.stats()
+        self.assertEqual(stats["get_audio"]["count"], 3)
+        self.assertEqual(stats["seeks"], 1)
+
+    def test_index_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+            shutil.copy(str(SAMPLE_PATH), str(tmp_dir / "video.mkv"))
+            (tmp_dir / "broken.mkv").write_bytes(b"not a video")
+            (tmp_dir / "notes.txt").write_text("not media")
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "ffms2",
+                    "-j",
+                    "2",
+                    "--summary",
+                    "-",
+                    str(tmp_dir),
+                ],
+                cwd=str(ROOT_DIR.parent),
+                stdout=subprocess.PIPE,
+                universal_newlines=True,
+            )
+            results = json.loads(process.stdout)
+            statuses = {
+                Path(result["input_file"]).name: result["status"]
+                for result in results
+            }
+            self.assertEqual(
+                statuses, {"broken.mkv": "error", "video.mkv": "indexed"}
+            )
+            self.assertTrue((tmp_dir / "video.mkv.ffindex").is_file())
+            self.assertEqual(process.returncode, 1)
+
+    def test_index_files_arguments(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_dir = Path(tmp_dir)
+            (tmp_dir / "episodes").mkdir()
+            shutil.copy(str(SAMPLE_PATH), str(tmp_dir / "intro.mkv"))
+            shutil.copy(str(SAMPLE_PATH), str(tmp_dir / "episodes/01.mkv"))
+
+            def index_files(*args):
+                output = subprocess.check_output(
+                    [sys.executable, "-m", "ffms2", "--summary", "-"]
+                    + list(args),
+                    cwd=str(tmp_dir),
+                    universal_newlines=True,
+                )
+                return [
+                    (result["input_file"], result["output_file"])
+                    for result in json.loads(output)
+                ]
+
+            # Former 'input output' form
+            self.assertEqual(
+                index_files("intro.mkv", "intro.idx"),
+                [("intro.mkv", "intro.idx")],
+            )
+            expected = [
+                ("intro.mkv", "intro.mkv.ffindex"),
+                (
+                    str(Path("episodes/01.mkv")),
+                    str(Path("episodes/01.mkv.ffindex")),
+                ),
+            ]
+            self.assertEqual(index_files("intro.mkv", "episodes"), expected)
+            self.assertEqual(
+                index_files("intro.mkv", str(Path("episodes/*.mkv"))),
+                expected,
+            )
+
+    def test_bench(self):
+        output = subprocess.check_output(
+            [
+                sys.executable,
+                "-m",
+                "ffms2.bench",
+                "--repeat=1",
+                "--frames=10",
+                "--random-frames=5",
+                "--threads=1",
+                "--formats=native",
+            ],
+            cwd=str(ROOT_DIR.parent),
+            universal_newlines=True,
+        )
+        results = json.loads(output)
+        (result,) = results["files"]
+        self.assertGreater(result["indexing"]["mb_per_second"], 0)
+        (video,) = result["video"]
+        self.assertEqual(video["sequential"]["frames"], 10)
+        self.assertIn("p95_ms", video["random"])
+        self.assertIn("median_ms", video["by_time"])
+        self.assertGreater(result["audio"]["samples_per_second"], 0)
+
+    def test_concurrent_sources(self):
+        index = self.index
+        frames = list(range(0, 359, 30))
+
+        def checksum(n):
+            video_source = ffms2.VideoSource(SAMPLE_PATH, 0, index)
+            return int(video_source.get_frame(n).planes[0].sum())
+
+        expected = [checksum(n) for n in frames]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertEqual(list(executor.map(checksum, frames)), expected)
+
+        def error_message(n):
+            with self.assertRaises(ffms2.Error) as cm:
+                ffms2.Indexer(ROOT_DIR / "data/missing{}.mkv".format(n))
+            return str(cm.exception)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for n, msg in enumerate(executor.map(error_message, range(8))):
+                self.assertIn("missing{}.mkv".format(n), msg)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -29,10 +29,10 @@ setup(
         "Development Status :: 3 - Alpha",
         "License :: OSI Approved :: GNU Lesser General Public License v3 or later (LGPLv3+)",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.2",
+        "Programming Language :: Python :: 3.7",
     ],
     data_files=data_libs,
-    python_requires=">=3.2",
+    python_requires=">=3.7",
     packages=find_packages(),
     package_dir={"ffms2": "ffms2"},
     package_data={"ffms2": ["data/*", "../COPYING", "../COPYING.LESSER"]},